@@ -1,7 +1,12 @@
+import asyncio
+import functools
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from django.conf import settings
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from .models import UserInDB, TokenData
 from fastapi import HTTPException, status
 
@@ -9,15 +14,97 @@ SECRET_KEY = "your_secret_key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# ❗️Built on first use: importing passlib and loading bcrypt is slow, and most
+# workers start up to serve redirects, which never hash a password
+@functools.cache
+def get_pwd_context():
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=settings.PASSWORD_HASHING["BCRYPT_ROUNDS"],
+    )
 
 # verify password
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 # get password hash
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+
+class PasswordHashPoolFull(Exception):
+    pass
+
+
+# ✅Dedicated, bounded pool for bcrypt so hashing never runs on the event loop.
+# bcrypt releases the GIL, so threads hash in parallel; past max_pending
+# (queued + running) new work is rejected instead of piling up.
+# A job counts as pending until it finishes, even if its caller went away.
+class PasswordHashPool:
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def run(self, func, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHashPoolFull()
+            self.pending += 1
+        submitted = time.monotonic()
+
+        def job():
+            waited = time.monotonic() - submitted
+            with self._lock:
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            return func(*args)
+
+        future = self._executor.submit(job)
+        future.add_done_callback(self._job_done)
+        return await asyncio.wrap_future(future)
+
+    # runs when the job finishes (or is cancelled before it started), not when the caller stops waiting
+    def _job_done(self, future):
+        with self._lock:
+            self.pending -= 1
+            if not future.cancelled():
+                self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_seconds": self.wait_seconds,
+            "max_wait_seconds": self.max_wait_seconds,
+        }
+
+
+password_hash_pool = PasswordHashPool(
+    workers=settings.PASSWORD_HASHING["WORKERS"],
+    max_pending=settings.PASSWORD_HASHING["MAX_PENDING"],
+)
+
+# verify password, off the event loop
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+# get password hash, off the event loop
+async def aget_password_hash(password: str) -> str:
+    return await password_hash_pool.run(get_password_hash, password)
 
 # create JWT token
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
@@ -1,3 +1,4 @@
+import functools
 import os
 from fastapi import Depends, FastAPI, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
@@ -5,18 +6,20 @@ from fastapi.responses import RedirectResponse
 from datetime import timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from authlib.integrations.starlette_client import OAuth
 from starlette.middleware.sessions import SessionMiddleware
 from dotenv import load_dotenv
 from starlette.config import Config
-import requests
 
 from .models import CustomUser, Token, TokenData, UserSchema, UserCreate
+from .db import db_pool
+from .jwks import google_jwks
+from .principal import Principal, get_principal
+from django.conf import settings
 from django.db import transaction
-from asgiref.sync import sync_to_async
 from .auth import (
-    verify_password,
-    get_password_hash,
+    PasswordHashPoolFull,
+    averify_password,
+    aget_password_hash,
     create_access_token,
     decode_access_token
 )
@@ -30,20 +33,27 @@ auth_app.add_middleware(SessionMiddleware, secret_key=os.getenv("SECRET_KEY"))
 client_id = os.getenv("GOOGLE_CLIENT_ID")
 client_secret = os.getenv("GOOGLE_CLIENT_SECRET")
 
-oauth = OAuth()
-oauth.register(
-    name='google',
-    client_id=client_id,
-    client_secret=client_secret,
-    authorize_url='https://accounts.google.com/o/oauth2/auth',
-    authorize_params=None,
-    access_token_url='https://oauth2.googleapis.com/token',
-    access_token_params=None,
-    refresh_token_url=None,
-    redirect_uri='http://127.0.0.1:8000/auth/callback',
-    client_kwargs={'scope': 'openid profile email'},
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration'
-)
+# ❗️The authlib client and the Google registration are set up on the first
+# OAuth request instead of at import, which every worker pays for
+@functools.cache
+def get_oauth():
+    from authlib.integrations.starlette_client import OAuth
+
+    oauth = OAuth()
+    oauth.register(
+        name='google',
+        client_id=client_id,
+        client_secret=client_secret,
+        authorize_url='https://accounts.google.com/o/oauth2/auth',
+        authorize_params=None,
+        access_token_url='https://oauth2.googleapis.com/token',
+        access_token_params=None,
+        refresh_token_url=None,
+        redirect_uri='http://127.0.0.1:8000/auth/callback',
+        client_kwargs={'scope': 'openid profile email'},
+        server_metadata_url='https://accounts.google.com/.well-known/openid-configuration'
+    )
+    return oauth
 
 # Define the constant
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
@@ -52,20 +62,35 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 async def get_user(username: str):
     try:
-        user = await sync_to_async(CustomUser.objects.get)(username=username)
+        user = await db_pool.run(CustomUser.objects.get, username=username)
         return user
     except CustomUser.DoesNotExist:
         return None
 
+def password_pool_busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent logins, try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
 async def authenticate_user(username: str, password: str):
     user = await get_user(username)
     if not user:
         return False
-    if not verify_password(password, user.password):
-        return False
+    try:
+        if not await averify_password(password, user.password):
+            return False
+    except PasswordHashPoolFull:
+        raise password_pool_busy_exception()
     return user
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+# signed claims carried by every token we issue; `typ` keeps refresh tokens
+# (valid for REFRESH_TOKEN_EXPIRE_DAYS) from being used as bearer tokens
+def token_claims(user: CustomUser, typ: str = "access") -> dict:
+    return {"sub": user.username, "uid": user.id, "disabled": user.disabled, "typ": typ}
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -76,37 +101,49 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         username = payload["sub"]
     except JWTError:
         raise credentials_exception
-    user = await get_user(username=username)
-    if user is None:
+    if payload.get("typ") == "refresh":
         raise credentials_exception
-    return user
+    # Trusting the claims skips the lookup entirely; see AUTH_PRINCIPAL in settings.
+    # Only for tokens that say they are access tokens: older ones may be refresh tokens.
+    if settings.AUTH_PRINCIPAL["TRUST_TOKEN_CLAIMS"] and payload.get("typ") == "access":
+        return Principal(id=payload["uid"], username=username, disabled=payload.get("disabled", False))
+    principal = await get_principal(username)
+    if principal is None:
+        raise credentials_exception
+    return principal
 
-async def get_current_active_user(current_user: UserSchema = Depends(get_current_user)):
+async def get_current_active_user(current_user: Principal = Depends(get_current_user)):
     if current_user.disabled:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-@sync_to_async
-def create_user_in_db(username: str, password: str, email: str):
-    with transaction.atomic():
-        return CustomUser.objects.create(
-            username=username,
-            password=get_password_hash(password),
-            email=email
-        )
+# the password is hashed by the caller, in the password hash pool
+async def create_user_in_db(username: str, hashed_password: str, email: str):
+    def create():
+        with transaction.atomic():
+            return CustomUser.objects.create(
+                username=username,
+                password=hashed_password,
+                email=email
+            )
+    return await db_pool.run(create)
 
 # ⛳️ all auth_endpoints:
 @auth_app.post("/register")
 async def register_user(user: UserCreate):
-    existing_user = await sync_to_async(CustomUser.objects.filter(email=user.email).first)()
+    existing_user = await db_pool.run(CustomUser.objects.filter(email=user.email).first)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    existing_username = await sync_to_async(CustomUser.objects.filter(username=user.username).first)()
+    existing_username = await db_pool.run(CustomUser.objects.filter(username=user.username).first)
     if existing_username:
         raise HTTPException(status_code=400, detail="Username already taken")
 
-    new_user = await create_user_in_db(user.username, user.password, user.email)
+    try:
+        hashed_password = await aget_password_hash(user.password)
+    except PasswordHashPoolFull:
+        raise password_pool_busy_exception()
+    new_user = await create_user_in_db(user.username, hashed_password, user.email)
     return {"message": "User registered successfully"}
 
 
@@ -122,10 +159,10 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     refresh_token_expires = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     refresh_token = create_access_token(
-        data={"sub": user.username}, expires_delta=refresh_token_expires
+        data=token_claims(user, "refresh"), expires_delta=refresh_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
 
@@ -138,6 +175,9 @@ async def refresh_access_token(request: Request):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Refresh token missing")
 
         payload = decode_access_token(refresh_token)
+        # ❗️only a refresh token mints access tokens, or an access token would never expire
+        if payload.get("typ") != "refresh":
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
         username = payload["sub"]
         user = await get_user(username=username)
         if not user:
@@ -145,40 +185,39 @@ async def refresh_access_token(request: Request):
 
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user.username}, expires_delta=access_token_expires
+            data=token_claims(user), expires_delta=access_token_expires
         )
         return {"access_token": access_token, "token_type": "bearer"}
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
 @auth_app.get("/users/me/", response_model=UserSchema)
-async def read_users_me(current_user: UserSchema = Depends(get_current_active_user)):
-    return current_user
+async def read_users_me(current_user: Principal = Depends(get_current_active_user)):
+    # the principal only carries what auth needs; load the full profile here
+    user = await get_user(current_user.username)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+    return user
 
 # OAuth2 login
 @auth_app.get("/login")
 async def login_via_google(request: Request):
     redirect_uri = 'http://127.0.0.1:8000/auth/callback'
-    return await oauth.google.authorize_redirect(request, redirect_uri)
+    return await get_oauth().google.authorize_redirect(request, redirect_uri)
 
 # OAuth2 callback
 @auth_app.get("/callback")
 async def auth_callback(request: Request):
     try:
-        token = await oauth.google.authorize_access_token(request)
+        token = await get_oauth().google.authorize_access_token(request)
 
         id_token = token.get('id_token')
         if not id_token:
             raise HTTPException(status_code=400, detail="ID token is missing")
 
         # Decode id_token
-        google_public_keys_url = "https://www.googleapis.com/oauth2/v3/certs"
-        google_public_keys = requests.get(google_public_keys_url).json()
         header = jwt.get_unverified_header(id_token)
-        key = next(
-            (key for key in google_public_keys["keys"] if key["kid"] == header["kid"]),
-            None
-        )
+        key = await google_jwks.get_key(header["kid"])
 
         if key is None:
             raise HTTPException(status_code=400, detail="Unable to find appropriate key")
@@ -194,22 +233,28 @@ async def auth_callback(request: Request):
 
         user = await get_user(username)
         if not user:
-            existing_user = await sync_to_async(CustomUser.objects.filter(email=email).first)()
+            existing_user = await db_pool.run(CustomUser.objects.filter(email=email).first)
             if existing_user:
                 raise HTTPException(status_code=400, detail="Email already registered")
 
-            user = await create_user_in_db(username=username, password='', email=email)
+            try:
+                hashed_password = await aget_password_hash('')
+            except PasswordHashPoolFull:
+                raise password_pool_busy_exception()
+            user = await create_user_in_db(username=username, hashed_password=hashed_password, email=email)
 
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         refresh_token_expires = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
         access_token = create_access_token(
-            data={"sub": user.username}, expires_delta=access_token_expires
+            data=token_claims(user), expires_delta=access_token_expires
         )
         refresh_token = create_access_token(
-            data={"sub": user.username}, expires_delta=refresh_token_expires
+            data=token_claims(user, "refresh"), expires_delta=refresh_token_expires
         )
 
         redirect_url = f'http://localhost:3000/auth/callback?username={username}&token={access_token}&refresh_token={refresh_token}'
         return RedirectResponse(url=redirect_url)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,68 @@
+import asyncio
+import contextlib
+from collections import deque
+
+
+# ✅Bounded in-process buffer between the request path and a background writer.
+# Appending never blocks and never waits on I/O: when the buffer is full the
+# item is dropped and counted; a disabled buffer takes nothing. Subclasses shape their items
+# after accepts() said yes, so a full buffer costs nothing more, and add their
+# own counters to stats().
+class BoundedBuffer:
+    def __init__(self, max_size: int, enabled: bool = True):
+        self.max_size = max_size
+        self.enabled = enabled
+        self._items = deque()
+        self.recorded = 0
+        self.dropped = 0
+
+    # False, with the drop counted, when there is no room for another item
+    def accepts(self) -> bool:
+        if not self.enabled:
+            return False
+        if len(self._items) >= self.max_size:
+            self.dropped += 1
+            return False
+        return True
+
+    def push(self, item):
+        self._items.append(item)
+        self.recorded += 1
+
+    def drain(self, limit: int | None = None) -> list:
+        items = []
+        while self._items and (limit is None or len(items) < limit):
+            items.append(self._items.popleft())
+        return items
+
+    def __len__(self):
+        return len(self._items)
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._items),
+            "max_size": self.max_size,
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+        }
+
+
+# ✅A loop that runs for the lifetime of the app, started and stopped from
+# get_application()'s startup/shutdown handlers. Arguments given to start()
+# follow the ones given here.
+class BackgroundTask:
+    def __init__(self, run, *args):
+        self.run = run
+        self.args = args
+        self._task = None
+
+    async def start(self, *args):
+        self._task = asyncio.create_task(self.run(*self.args, *args), name=self.run.__name__)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
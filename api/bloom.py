@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import math
+import threading
+from hashlib import blake2b
+
+from django.conf import settings
+
+from .background import BackgroundTask
+from .db import db_pool
+from .models import URLMapping
+
+logger = logging.getLogger(__name__)
+
+
+# ✅Plain Bloom filter: no false negatives, tunable false positive rate
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        # ❗️add() is called from several db_pool threads at once; a bit lost in an
+        # unguarded read-modify-write would be a false negative until restart
+        self._lock = threading.Lock()
+
+    def _positions(self, item: str):
+        digest = blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str):
+        positions = list(self._positions(item))
+        with self._lock:
+            for pos in positions:
+                self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+# None until the startup build finishes; the guard lets everything through until then
+short_key_bloom: BloomFilter | None = None
+
+
+def might_exist(short_key: str) -> bool:
+    return short_key_bloom is None or short_key in short_key_bloom
+
+
+def remember_short_key(short_key: str):
+    if short_key_bloom is not None:
+        short_key_bloom.add(short_key)
+
+
+def load_short_keys(bloom: BloomFilter, after_id: int) -> int:
+    last_id = after_id
+    rows = URLMapping.objects.filter(id__gt=after_id).order_by('id').values_list('id', 'short_url')
+    for last_id, short_key in rows.iterator(chunk_size=10000):
+        bloom.add(short_key)
+    return last_id
+
+
+# ♻️Build the filter, then keep it in step with keys minted by other workers
+async def maintain_short_key_bloom():
+    global short_key_bloom
+    config = settings.SHORT_KEY_BLOOM_FILTER
+
+    bloom = BloomFilter(config["CAPACITY"], config["ERROR_RATE"])
+    try:
+        newest_id = await db_pool.run(load_short_keys, bloom, 0)
+    except Exception:
+        logger.exception("Short key Bloom filter build failed; guard stays disabled")
+        return
+    short_key_bloom = bloom
+    logger.info("Short key Bloom filter ready (%s bits, %s hashes)", bloom.size, bloom.hash_count)
+
+    # Each sync rescans from the previous sync's watermark, so rows whose
+    # transaction committed after a higher id was already seen are not lost.
+    # The first one starts at the build's watermark, not at the start of the table.
+    scan_from = newest_id
+    while True:
+        await asyncio.sleep(config["SYNC_INTERVAL"])
+        try:
+            latest_id = await db_pool.run(load_short_keys, bloom, scan_from)
+            scan_from, newest_id = newest_id, latest_id
+        except Exception:
+            logger.exception("Short key Bloom filter sync failed")
+
+
+short_key_bloom_sync = BackgroundTask(maintain_short_key_bloom)
+start_short_key_bloom = short_key_bloom_sync.start
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from redis import asyncio as aioredis
+
+# ✅Async Redis client sharing the django-redis keyspace.
+# Keys and values go through django-redis' own make_key/encode/decode, so
+# entries written here are readable by `django.core.cache` and vice versa.
+# One client per event loop: its pooled connections are bound to the loop that opened them.
+# The pool is bounded by REDIS_POOL like the sync one; callers wait for a free connection.
+_async_redis = weakref.WeakKeyDictionary()
+
+
+def get_async_redis() -> aioredis.Redis:
+    loop = asyncio.get_running_loop()
+    client = _async_redis.get(loop)
+    if client is None:
+        config = settings.REDIS_POOL
+        pool = aioredis.BlockingConnectionPool.from_url(
+            settings.CACHES["default"]["LOCATION"],
+            max_connections=config["MAX_CONNECTIONS"],
+            timeout=config["TIMEOUT"],
+            health_check_interval=config["HEALTH_CHECK_INTERVAL"],
+            socket_connect_timeout=config["SOCKET_CONNECT_TIMEOUT"],
+            socket_timeout=config["SOCKET_TIMEOUT"],
+        )
+        client = _async_redis[loop] = aioredis.Redis(connection_pool=pool)
+    return client
+
+
+# Counts from redis-py's pool internals: the sync BlockingConnectionPool keeps
+# idle connections (and None placeholders) in a LIFO queue, the async one in a list
+def _sync_pool_stats(pool) -> dict:
+    idle = sum(1 for conn in list(pool.pool.queue) if conn is not None)
+    return {"max_connections": pool.max_connections, "open": len(pool._connections), "idle": idle,
+            "in_use": len(pool._connections) - idle}
+
+
+def _async_pool_stats(pool) -> dict:
+    idle, in_use = len(pool._available_connections), len(pool._in_use_connections)
+    return {"max_connections": pool.max_connections, "open": idle + in_use, "idle": idle, "in_use": in_use}
+
+
+# Flat "<sync|async>_<count>" keys; the async pool is the current loop's, if it has one yet
+def redis_pool_stats() -> dict:
+    pools = {"sync": _sync_pool_stats(cache.client.get_client().connection_pool)}
+    try:
+        client = _async_redis.get(asyncio.get_running_loop())
+    except RuntimeError:
+        client = None
+    if client is not None:
+        pools["async"] = _async_pool_stats(client.connection_pool)
+    return {f"{kind}_{key}": value for kind, stats in pools.items() for key, value in stats.items()}
+
+
+def make_key(key: str) -> str:
+    return str(cache.client.make_key(key))
+
+
+async def aget(key: str, default=None):
+    value = await get_async_redis().get(make_key(key))
+    if value is None:
+        return default
+    return cache.client.decode(value)
+
+
+async def aset(key: str, value, timeout: int | None = None):
+    if timeout is None:
+        timeout = cache.default_timeout
+    await get_async_redis().set(make_key(key), cache.client.encode(value), ex=timeout)
+
+
+# ✅Bounded in-process cache (LRU + TTL), one per worker, in front of Redis
+class LocalCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float | None = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+short_key_l1 = LocalCache(
+    max_size=settings.SHORT_KEY_L1_CACHE["MAX_SIZE"],
+    ttl=settings.SHORT_KEY_L1_CACHE["TTL"],
+)
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from hashlib import blake2b
+
+from django.conf import settings
+
+from .background import BackgroundTask, BoundedBuffer
+from .db import db_pool
+from .models import ClickEvent
+
+logger = logging.getLogger(__name__)
+
+
+# ✅Bounded in-process buffer of click events. Recording never blocks and never
+# waits on the database: once the buffer is full new events are dropped and counted.
+class ClickBuffer(BoundedBuffer):
+    def __init__(self, max_size: int, enabled: bool = True):
+        super().__init__(max_size, enabled)
+        self.flushed = 0
+        self.failed = 0
+
+    def record(self, short_key: str, referrer: str, user_agent: str):
+        if not self.accepts():
+            return
+        ua_hash = blake2b(user_agent.encode(), digest_size=8).hexdigest() if user_agent else ''
+        self.push((short_key, time.time(), referrer[:255], ua_hash))
+
+    def stats(self) -> dict:
+        return {**super().stats(), "flushed": self.flushed, "failed": self.failed}
+
+
+click_buffer = ClickBuffer(
+    max_size=settings.CLICK_TRACKING["BUFFER_SIZE"],
+    enabled=settings.CLICK_TRACKING["ENABLED"],
+)
+
+
+def write_clicks(events: list):
+    ClickEvent.objects.bulk_create([
+        ClickEvent(
+            short_url=short_key,
+            clicked_at=datetime.fromtimestamp(ts, tz=timezone.utc),
+            referrer=referrer,
+            ua_hash=ua_hash,
+        )
+        for short_key, ts, referrer, ua_hash in events
+    ])
+
+
+async def flush_clicks(buffer: ClickBuffer, batch_size: int):
+    while len(buffer):
+        events = buffer.drain(batch_size)
+        try:
+            await db_pool.run(write_clicks, events)
+            buffer.flushed += len(events)
+        except Exception:
+            buffer.failed += len(events)
+            logger.exception("Dropped %s click events after a failed write", len(events))
+
+
+# ♻️Drain the buffer in large batches, early if it fills up between intervals
+async def run_click_flusher(buffer: ClickBuffer):
+    config = settings.CLICK_TRACKING
+    while True:
+        deadline = time.monotonic() + config["FLUSH_INTERVAL"]
+        while len(buffer) < config["BATCH_SIZE"] and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        await flush_clicks(buffer, config["BATCH_SIZE"])
+
+
+click_flusher = BackgroundTask(run_click_flusher, click_buffer)
+start_click_flusher = click_flusher.start
+
+
+async def stop_click_flusher():
+    await click_flusher.stop()
+    await flush_clicks(click_buffer, settings.CLICK_TRACKING["BATCH_SIZE"])
@@ -0,0 +1,140 @@
+import asyncio
+import contextvars
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from .background import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+
+# ✅Bounded pool of database threads, each keeping its own persistent connection.
+# Django connections are per thread, so bounding the threads bounds the
+# connections. Around every job close_old_connections() applies CONN_MAX_AGE and,
+# with CONN_HEALTH_CHECKS, pings a reused connection before its first query;
+# a thread idle for IDLE_TIMEOUT closes its connection. Threads start on demand.
+# Jobs run in a copy of the caller's context, like sync_to_async, so request
+# metrics and profiling still see their queries.
+class DatabasePool:
+    def __init__(self, max_connections: int, idle_timeout: float):
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self._jobs = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._threads = 0
+        self._idle = 0
+        self._open = set()
+        self.completed = 0
+        self.recycled = 0
+        self.reaped = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def submit(self, func, *args, **kwargs) -> Future:
+        future = Future()
+        with self._lock:
+            self._jobs.put((future, time.monotonic(), contextvars.copy_context(), func, args, kwargs))
+            if self._jobs.qsize() > self._idle and self._threads < self.max_connections:
+                self._threads += 1
+                threading.Thread(target=self._worker, name=f"db-pool-{self._threads}", daemon=True).start()
+        return future
+
+    async def run(self, func, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def _worker(self):
+        ident = threading.get_ident()
+        while True:
+            with self._lock:
+                self._idle += 1
+            try:
+                job = self._jobs.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                if connection.connection is not None:
+                    connection.close()
+                    # an in-memory SQLite connection is the database; Django keeps it open
+                    if connection.connection is None:
+                        with self._lock:
+                            self._open.discard(ident)
+                            self.reaped += 1
+                continue
+            finally:
+                with self._lock:
+                    self._idle -= 1
+
+            future, submitted, context, func, args, kwargs = job
+            waited = time.monotonic() - submitted
+            with self._lock:
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            if not future.set_running_or_notify_cancel():
+                continue
+            result = error = None
+            try:
+                self._check_connection(ident)
+                result = context.run(func, *args, **kwargs)
+            except BaseException as e:
+                error = e
+            finally:
+                self._check_connection(ident)
+                with self._lock:
+                    self.completed += 1
+            # only once the connection is checked, so stats() already counts this job
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    # Closes this thread's connection if it is past CONN_MAX_AGE or broken
+    def _check_connection(self, ident: int):
+        was_open = connection.connection is not None
+        close_old_connections()
+        is_open = connection.connection is not None
+        with self._lock:
+            if was_open and not is_open:
+                self.recycled += 1
+            (self._open.add if is_open else self._open.discard)(ident)
+
+    def stats(self) -> dict:
+        return {
+            "max_connections": self.max_connections,
+            "threads": self._threads,
+            "idle_threads": self._idle,
+            "open_connections": len(self._open),
+            "queued": self._jobs.qsize(),
+            "completed": self.completed,
+            "recycled": self.recycled,
+            "reaped": self.reaped,
+            "wait_seconds": self.wait_seconds,
+            "max_wait_seconds": self.max_wait_seconds,
+        }
+
+
+db_pool = DatabasePool(
+    max_connections=settings.DB_POOL["MAX_CONNECTIONS"],
+    idle_timeout=settings.DB_POOL["IDLE_TIMEOUT"],
+)
+
+
+# ♻️The async ORM (and sync_to_async's default, thread-sensitive mode) runs every
+# query on one shared thread whose connection no request cycle ever checks;
+# apply CONN_MAX_AGE to it and drop it if it errored, every REAP_INTERVAL seconds
+async def run_shared_connection_reaper():
+    reap = sync_to_async(close_old_connections)
+    while True:
+        await asyncio.sleep(settings.DB_POOL["REAP_INTERVAL"])
+        try:
+            await reap()
+        except Exception:
+            logger.exception("Checking the shared database connection failed")
+
+
+shared_connection_reaper = BackgroundTask(run_shared_connection_reaper)
+start_shared_connection_reaper = shared_connection_reaper.start
@@ -1,15 +1,24 @@
-import random
-import string
-from typing import List
-from fastapi import FastAPI, HTTPException, Depends
+from typing import List, Union
+from fastapi import FastAPI, HTTPException, Depends, Request
 from pydantic import BaseModel
 from .auth_endpoints import get_current_active_user
-from .models import URLMapping, URLMappingSchema, CustomUser, UserURLMapping
-from django.db import transaction
-from fastapi.responses import RedirectResponse
+from .bloom import remember_short_key
+from .cache import short_key_l1
+from .clicks import click_buffer
+from .db import db_pool
+from .enrichment import title_enrichment
+from .keygen import get_key_allocator
+from .links import InvalidCursor, decode_cursor, encode_cursor, fetch_links, link_row_to_dict, stream_links
+from .lookup import resolve_short_key
+from .principal import Principal
+from .rollups import link_stats, user_stats
+from .titles import title_fetcher
+from .models import LinksPage, URLMapping, URLMappingSchema, UserURLMapping, long_url_digest
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from fastapi.responses import RedirectResponse, StreamingResponse
 from django.core.cache import cache
-import requests
-from bs4 import BeautifulSoup
 
 app = FastAPI()
 
@@ -17,69 +26,125 @@ class Shortener:
     def __init__(self):
         # 🔨Base URL prefix
         self.real_base = "http://127.0.0.1:8000/api/"
-        self.chars = string.ascii_letters + string.digits
-
-    def _generate_short_key(self):
-        # ✅Generate a 6-character random short URL key
-        return ''.join(random.choice(self.chars) for _ in range(6))
-
-    def encode(self, longUrl: str, title: str, user: CustomUser) -> dict:
+        # ✅Short key strategy, see SHORT_KEY_ALLOCATOR in settings
+        self.key_allocator = get_key_allocator()
+        self.batch_chunk_size = settings.ENCODE_BATCH["CHUNK_SIZE"]
+
+    def _upsert_mappings(self, rows: list, user: Principal) -> dict:
+        # ✅INSERT ... ON CONFLICT (long_url_digest) DO UPDATE with a no-op update:
+        # new URLs are inserted and known ones are locked and returned, in one
+        # statement that stays correct when two users encode the same URL at once.
+        # bulk_create(update_conflicts=...) can't do this, it doesn't return the
+        # existing row's short_url.
+        created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        params = []
+        for long_url, digest, short_key in rows:
+            params += [long_url, digest, short_key, created_at, user.id]
+        sql = (
+            f"INSERT INTO {URLMapping._meta.db_table} "
+            "(long_url, long_url_digest, short_url, created_at, created_by_id) "
+            f"VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))} "
+            "ON CONFLICT (long_url_digest) DO UPDATE SET long_url_digest = EXCLUDED.long_url_digest "
+            "RETURNING id, short_url, long_url_digest"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return {digest: (mapping_id, short_key) for mapping_id, short_key, digest in cursor.fetchall()}
+
+    def _link_users(self, links: list, user: Principal):
+        # ✅One upsert for the user's links: new rows are inserted, known ones get the new title
+        UserURLMapping.objects.bulk_create(
+            [UserURLMapping(user_id=user.id, url_mapping_id=mapping_id, title=title) for mapping_id, title in links],
+            batch_size=self.batch_chunk_size,
+            update_conflicts=True,
+            unique_fields=['user', 'url_mapping'],
+            update_fields=['title'],
+        )
+
+    def _prime(self, created: list):
+        # Prime the redirect path; this also replaces any negative entry for the keys
+        cache.set_many({f"short:{short_key}": long_url for long_url, short_key in created})
+        for _, short_key in created:
+            short_key_l1.delete(short_key)
+            remember_short_key(short_key)
+
+    def encode(self, longUrl: str, title: str, user: Principal) -> dict:
+        # ❗️Take a short key before the transaction: a sequence block is reserved
+        # in a transaction of its own, so a rollback below never reuses its ids.
+        # If the URL is already mapped the key is simply skipped.
+        short_key = self.key_allocator.allocate()
+        digest = long_url_digest(longUrl)
         with transaction.atomic():
-            # 1️⃣Check if the long URL exists in cache
-            cache_key = f"url:{longUrl}"
-            cached_short_urls = cache.get(cache_key)
-            if cached_short_urls:
-                # 1. Retrieve mapping from the database
-                mapping = URLMapping.objects.filter(long_url=longUrl).first()
-                # 2. Create/get UserURLMapping for the current user
-                user_url_mapping, created = UserURLMapping.objects.get_or_create(
-                    user=user,
-                    url_mapping=mapping,
-                    defaults={'title': title}
-                )
-                if not created:
-                    # 3. Update title
-                    user_url_mapping.title = title
-                    user_url_mapping.save()
-                return cached_short_urls
-
-            # 2️⃣ Check if the long URL exists in the database
-            mapping = URLMapping.objects.filter(long_url=longUrl).first()
-            if mapping:
-                # 1. Create/get UserURLMapping for the current user
-                user_url_mapping, created = UserURLMapping.objects.get_or_create(
-                    user=user,
-                    url_mapping=mapping,
-                    defaults={'title': title}
-                )
-                if not created:
-                    # 2. Update title
-                    user_url_mapping.title = title
-                    user_url_mapping.save()
-                short_urls = {
-                    "real_url": self.real_base + mapping.short_url,
-                }
-                # 3. Cache the result
-                cache.set(cache_key, short_urls)
-                return short_urls
-
-            # ❗️Ensure the generated short key is unique
-            while True:
-                short_key = self._generate_short_key()
-                if not URLMapping.objects.filter(short_url=short_key).exists():
-                    break
-
-            # ♻️Save the long URL and short URL to the database
-            mapping = URLMapping(long_url=longUrl, short_url=short_key, created_by=user)
-            mapping.save()
-            UserURLMapping.objects.create(user=user, url_mapping=mapping, title=title)
-
-            short_urls = {
-                "real_url": self.real_base + short_key,
-            }
-            # Cache the result
-            cache.set(cache_key, short_urls)
-            return short_urls
+            # ❗️Only the random strategy can collide
+            if not self.key_allocator.unique:
+                while URLMapping.objects.filter(short_url=short_key).exists():
+                    short_key = self.key_allocator.allocate()
+
+            # 1️⃣Insert the mapping or take the existing one
+            mapping_id, mapped_key = self._upsert_mappings([(longUrl, digest, short_key)], user)[digest]
+            # 2️⃣Link the current user and set their title
+            self._link_users([(mapping_id, title)], user)
+
+        if mapped_key == short_key:
+            self._prime([(longUrl, short_key)])
+        # ✅No title given: it's fetched in the background, the response doesn't wait for it
+        if not title:
+            title_enrichment.enqueue(mapping_id, longUrl)
+        return {
+            "real_url": self.real_base + mapped_key,
+        }
+
+    def _allocate_keys(self, count: int) -> list:
+        keys = set()
+        while len(keys) < count:
+            candidates = {self.key_allocator.allocate() for _ in range(count - len(keys))} - keys
+            if not self.key_allocator.unique:
+                # one collision query per round instead of one per key
+                candidates -= set(URLMapping.objects.filter(short_url__in=candidates).values_list('short_url', flat=True))
+            keys |= candidates
+        return list(keys)
+
+    def encode_many(self, items: list, user: Principal) -> dict:
+        # 1️⃣Dedupe; a later title wins, as with repeated single encodes
+        titles = dict(items)
+        urls = list(titles)
+        digests = {url: long_url_digest(url) for url in urls}
+        chunk_size = self.batch_chunk_size
+
+        # 2️⃣Look up URLs that are already mapped, so no keys are spent on them
+        mappings = {}
+        for start in range(0, len(urls), chunk_size):
+            chunk = [digests[url] for url in urls[start:start + chunk_size]]
+            rows = URLMapping.objects.filter(long_url_digest__in=chunk).values_list('id', 'long_url', 'short_url')
+            for mapping_id, long_url, short_key in rows:
+                mappings[long_url] = (mapping_id, short_key)
+
+        # ❗️Keys for new URLs are taken before the transaction, as in encode
+        new_urls = [url for url in urls if url not in mappings]
+        short_keys = self._allocate_keys(len(new_urls))
+
+        created = []
+        with transaction.atomic():
+            # 3️⃣Upsert new mappings; one mapped concurrently by someone else is returned as is
+            for start in range(0, len(new_urls), chunk_size):
+                rows = [
+                    (url, digests[url], short_key)
+                    for url, short_key in zip(new_urls[start:start + chunk_size], short_keys[start:start + chunk_size])
+                ]
+                upserted = self._upsert_mappings(rows, user)
+                for url, digest, short_key in rows:
+                    mappings[url] = upserted[digest]
+                    if upserted[digest][1] == short_key:
+                        created.append((url, short_key))
+
+            # 4️⃣Upsert this user's links and titles
+            self._link_users([(mappings[url][0], titles[url]) for url in urls], user)
+
+        self._prime(created)
+        for url in urls:
+            if not titles[url]:
+                title_enrichment.enqueue(mappings[url][0], url)
+        return {url: {"real_url": self.real_base + short_key} for url, (_, short_key) in mappings.items()}
 
 shortener = Shortener()
 
@@ -87,58 +152,90 @@ class URLItem(BaseModel):
     url: str
     title: str = ''
 
+class URLBatch(BaseModel):
+    items: List[URLItem]
+
 # ⛳️All my endpoints:
 @app.get("/test")
 async def read_test():
     return {"message": "⭐️This is a test endpoint"}
 
 # 1️⃣Retrieve all links for the current user:
-@app.get("/links", response_model=List[URLMappingSchema])
-def get_all_links(current_user: CustomUser = Depends(get_current_active_user)):
-    user_links = UserURLMapping.objects.filter(user=current_user).select_related('url_mapping')
-    return [
-        URLMappingSchema(
-            long_url=user_link.url_mapping.long_url,
-            short_url=user_link.url_mapping.short_url,
-            title=user_link.title,
-            created_at=user_link.url_mapping.created_at,
-            created_by=user_link.url_mapping.created_by.username
-        ) for user_link in user_links
-    ]
+# with ?limit=N a keyset page and an opaque next_cursor, otherwise the full list streamed
+# (rows are serialized by hand, the models only document the responses)
+@app.get("/links", responses={200: {"model": Union[List[URLMappingSchema], LinksPage]}})
+async def get_all_links(limit: int | None = None, cursor: str | None = None,
+                        current_user: Principal = Depends(get_current_active_user)):
+    page = settings.LINKS_PAGE
+    if limit is None and cursor is None:
+        return StreamingResponse(
+            stream_links(current_user.id, page["STREAM_CHUNK_SIZE"]),
+            media_type="application/json",
+        )
+
+    limit = max(1, min(limit or page["DEFAULT_LIMIT"], page["MAX_LIMIT"]))
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    rows = await fetch_links(current_user.id, after, limit + 1)
+    next_cursor = encode_cursor(rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+    return {
+        "items": [link_row_to_dict(row) for row in rows[:limit]],
+        "next_cursor": next_cursor
+    }
+
+# 1️⃣.1 Click stats for one of the current user's links, read from the rollups:
+@app.get("/links/{short_key}/stats")
+async def get_link_stats(short_key: str, hours: int = 48, days: int = 30,
+                         current_user: Principal = Depends(get_current_active_user)):
+    mapping_id = await UserURLMapping.objects.filter(
+        user_id=current_user.id, url_mapping__short_url=short_key
+    ).values_list('url_mapping_id', flat=True).afirst()
+    if mapping_id is None:
+        raise HTTPException(status_code=404, detail="URL not found")
+    stats = await link_stats(mapping_id, hours=max(1, min(hours, 24 * 14)), days=max(1, min(days, 366)))
+    return {"short_url": short_key, **stats}
+
+# 1️⃣.2 Click summary across all of the current user's links:
+@app.get("/stats/summary")
+async def get_stats_summary(days: int = 7, top: int = 10,
+                            current_user: Principal = Depends(get_current_active_user)):
+    return await user_stats(current_user.id, days=max(1, min(days, 366)), top=max(1, min(top, 100)))
 
-# 2️⃣Encode long URL -> short URL:
+# 2️⃣Encode long URL -> short URL (the ORM work runs on the database pool):
 @app.post("/encode")
-def encode_url(item: URLItem, current_user: CustomUser = Depends(get_current_active_user)):
-    short_urls = shortener.encode(item.url, item.title, current_user)
+async def encode_url(item: URLItem, current_user: Principal = Depends(get_current_active_user)):
+    short_urls = await db_pool.run(shortener.encode, item.url, item.title, current_user)
     return {
         "real_url": short_urls["real_url"],
         "title": item.title
     }
 
+# 2️⃣Encode many long URLs in one request:
+@app.post("/encode/batch")
+async def encode_url_batch(batch: URLBatch, current_user: Principal = Depends(get_current_active_user)):
+    if len(batch.items) > settings.ENCODE_BATCH["MAX_ITEMS"]:
+        raise HTTPException(status_code=413, detail=f"At most {settings.ENCODE_BATCH['MAX_ITEMS']} URLs per batch")
+    results = await db_pool.run(shortener.encode_many, [(item.url, item.title) for item in batch.items], current_user)
+    return [
+        {
+            "url": item.url,
+            "real_url": results[item.url]["real_url"],
+            "title": item.title
+        } for item in batch.items
+    ]
+
 # 3️⃣Redirect to the long URL based on the short key
 @app.get("/{short_key}")
-def redirect_url(short_key: str):
-    cache_key = f"short:{short_key}"
-    cached_long_url = cache.get(cache_key)
-    if cached_long_url:
-        return RedirectResponse(url=cached_long_url)
-
-    mapping = URLMapping.objects.filter(short_url=short_key).first()
-    if mapping:
-        long_url = mapping.long_url
-        cache.set(cache_key, long_url)
-        return RedirectResponse(url=long_url)
-    else:
+async def redirect_url(short_key: str, request: Request):
+    long_url = await resolve_short_key(short_key)
+    if long_url is None:
         raise HTTPException(status_code=404, detail="URL not found")
+    click_buffer.record(short_key, request.headers.get("referer", ""), request.headers.get("user-agent", ""))
+    return RedirectResponse(url=long_url)
 
 # 4️⃣ Fetch the title of a long URL:
 @app.post("/fetch_title")
-def fetch_title(url: URLItem):
-    try:
-        response = requests.get(url.url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        title = soup.title.string if soup.title else "No title found"
-        return {"title": title}
-    except requests.RequestException as e:
-        return {"title": ""}
+async def fetch_title(url: URLItem):
+    return {"title": await title_fetcher.fetch(url.url)}
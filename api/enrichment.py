@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db.models import Case, Value, When
+
+from .background import BackgroundTask, BoundedBuffer
+from .db import db_pool
+from .models import UserURLMapping
+from .titles import NO_TITLE, title_fetcher
+
+logger = logging.getLogger(__name__)
+
+
+# ✅Titles for links encoded without one are fetched off the request path.
+# encode() only appends (mapping_id, long_url) here; a background task drains
+# the queue in batches, fetches titles with a per-host rate limit and fills in
+# UserURLMapping.title for every user whose title is still blank.
+# Like the click buffer the queue is bounded and in-process: jobs beyond
+# MAX_PENDING, or still queued when the worker stops, are dropped.
+class TitleEnrichmentQueue(BoundedBuffer):
+    def __init__(self, max_pending: int, enabled: bool = True):
+        super().__init__(max_pending, enabled)
+        self.enriched = 0
+        self.failed = 0
+
+    def enqueue(self, mapping_id: int, long_url: str):
+        if self.accepts():
+            self.push((mapping_id, long_url))
+
+    # up to `limit` jobs as {mapping_id: long_url}; a mapping queued twice is fetched once
+    def drain_jobs(self, limit: int) -> dict:
+        return dict(self.drain(limit))
+
+    def stats(self) -> dict:
+        return {**super().stats(), "enriched": self.enriched, "failed": self.failed}
+
+
+title_enrichment = TitleEnrichmentQueue(
+    max_pending=settings.TITLE_ENRICHMENT["MAX_PENDING"],
+    enabled=settings.TITLE_ENRICHMENT["ENABLED"],
+)
+
+
+def write_titles(titles: dict) -> int:
+    # One UPDATE for the whole batch; titles users have set meanwhile are kept
+    return UserURLMapping.objects.filter(url_mapping_id__in=titles, title='').update(
+        title=Case(*[When(url_mapping_id=mapping_id, then=Value(title)) for mapping_id, title in titles.items()])
+    )
+
+
+# A request to a host starts at least HOST_INTERVAL seconds after the previous one ended,
+# across batches; different hosts are fetched concurrently.
+_host_next_fetch = {}
+
+
+async def _fetch_host_titles(host: str, jobs: list, interval: float) -> dict:
+    titles = {}
+    for mapping_id, long_url in jobs:
+        delay = _host_next_fetch.get(host, 0) - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        title = await title_fetcher.fetch(long_url)
+        _host_next_fetch[host] = time.monotonic() + interval
+        if title and title != NO_TITLE:
+            titles[mapping_id] = title
+    return titles
+
+
+async def enrich_titles(queue: TitleEnrichmentQueue, batch_size: int, interval: float) -> int:
+    jobs = queue.drain_jobs(batch_size)
+    by_host = defaultdict(list)
+    for mapping_id, long_url in jobs.items():
+        # ❗️one malformed URL must not take the rest of the drained batch with it
+        try:
+            host = urlsplit(long_url).hostname or ''
+        except ValueError:
+            queue.failed += 1
+            continue
+        by_host[host].append((mapping_id, long_url))
+
+    titles = {}
+    for host_titles in await asyncio.gather(*[
+        _fetch_host_titles(host, host_jobs, interval) for host, host_jobs in by_host.items()
+    ]):
+        titles.update(host_titles)
+    queue.failed += sum(len(host_jobs) for host_jobs in by_host.values()) - len(titles)
+
+    now = time.monotonic()
+    for host in [host for host, next_fetch in _host_next_fetch.items() if next_fetch < now]:
+        del _host_next_fetch[host]
+
+    if not titles:
+        return 0
+    updated = await db_pool.run(write_titles, titles)
+    queue.enriched += len(titles)
+    return updated
+
+
+# ♻️Work through the queue in batches, waiting briefly when it's empty
+async def run_title_enrichment(queue: TitleEnrichmentQueue):
+    config = settings.TITLE_ENRICHMENT
+    while True:
+        if not len(queue):
+            await asyncio.sleep(config["POLL_INTERVAL"])
+            continue
+        try:
+            await enrich_titles(queue, config["BATCH_SIZE"], config["HOST_INTERVAL"])
+        except Exception:
+            logger.exception("Title enrichment batch failed")
+
+
+title_enrichment_task = BackgroundTask(run_title_enrichment, title_enrichment)
+start_title_enrichment = title_enrichment_task.start
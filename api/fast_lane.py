@@ -0,0 +1,81 @@
+from urllib.parse import quote
+
+from fastapi.routing import APIRoute
+
+from .clicks import click_buffer
+from .lookup import resolve_short_key
+
+NOT_FOUND_BODY = b'{"detail":"URL not found"}'
+NOT_FOUND_START = {
+    "type": "http.response.start",
+    "status": 404,
+    "headers": [(b"content-length", str(len(NOT_FOUND_BODY)).encode()), (b"content-type", b"application/json")],
+}
+NOT_FOUND_BODY_MESSAGE = {"type": "http.response.body", "body": NOT_FOUND_BODY}
+REDIRECT_HEADERS = [(b"content-length", b"0")]
+EMPTY_BODY_MESSAGE = {"type": "http.response.body", "body": b""}
+
+
+# Same quoting as starlette's RedirectResponse
+def location_header(long_url: str) -> bytes:
+    return quote(long_url, safe=":/%#?=@[]!$&'()*+,;").encode("latin-1")
+
+
+# ✅Raw ASGI handler for GET {prefix}/{short_key}, ahead of routing, mounts and
+# dependency injection. It answers exactly like `redirect_url` (307 or the same
+# 404) and passes everything else through untouched: other methods, nested paths,
+# names of the inner app's own GET routes (/links, /docs, ...) and requests with
+# an Origin header, which need CORSMiddleware.
+class RedirectFastLane:
+    def __init__(self, app, prefix: str, inner_app, endpoint=None):
+        self.app = app
+        self.prefix = prefix.rstrip("/") + "/"
+        # static single-segment GET routes of the inner app win over /{short_key}
+        self.reserved = {
+            route.path.strip("/") for route in inner_app.routes
+            if "{" not in route.path and "/" not in route.path.strip("/")
+            and (not isinstance(route, APIRoute) or "GET" in route.methods)
+        }
+        # left in the scope for MetricsMiddleware's route label
+        self.endpoint = endpoint
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        if not path.startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+        short_key = path[len(self.prefix):]
+        if not short_key or "/" in short_key or short_key in self.reserved:
+            await self.app(scope, receive, send)
+            return
+
+        referrer = user_agent = b""
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                await self.app(scope, receive, send)
+                return
+            if name == b"referer":
+                referrer = value
+            elif name == b"user-agent":
+                user_agent = value
+
+        if self.endpoint is not None:
+            scope["endpoint"] = self.endpoint
+        long_url = await resolve_short_key(short_key)
+        if long_url is None:
+            await send(NOT_FOUND_START)
+            await send(NOT_FOUND_BODY_MESSAGE)
+            return
+        click_buffer.record(short_key, referrer.decode("latin-1"), user_agent.decode("latin-1"))
+        await send({
+            "type": "http.response.start",
+            "status": 307,
+            "headers": REDIRECT_HEADERS + [(b"location", location_header(long_url))],
+        })
+        await send(EMPTY_BODY_MESSAGE)
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import re
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+# ✅Signing keys of an OpenID provider, cached by kid.
+# Keys live for the Cache-Control max-age of the JWKS response and are refreshed
+# in the background once most of it has passed. An unknown kid (key rotation)
+# triggers one refetch, shared by every concurrent caller and rate limited so
+# tokens with made-up kids can't hammer the provider. After a failed fetch
+# nothing is fetched again for min_refetch_interval; stale keys are served meanwhile.
+class JWKSKeyStore:
+    def __init__(self, url: str, timeout: float = 5.0, default_max_age: int = 3600,
+                 min_refetch_interval: float = 30.0, refresh_ratio: float = 0.8):
+        self.url = url
+        self.timeout = timeout
+        self.default_max_age = default_max_age
+        self.min_refetch_interval = min_refetch_interval
+        self.refresh_ratio = refresh_ratio
+        self._keys = {}
+        self._fetched_at = 0.0
+        self._expires_at = 0.0
+        self._attempted_at = float("-inf")
+        self._failed = False
+        self._inflight = None
+        self.fetches = 0
+
+    async def get_key(self, kid: str) -> dict | None:
+        now = time.monotonic()
+        key = self._keys.get(kid)
+        if key is not None and now < self._expires_at:
+            refresh_at = self._fetched_at + (self._expires_at - self._fetched_at) * self.refresh_ratio
+            if now >= refresh_at and self._inflight is None and not self._backing_off(now):
+                self._start_fetch()
+            return key
+
+        if self._inflight is None:
+            if self._backing_off(now):
+                return key
+            if key is None and self._keys and now - self._attempted_at < self.min_refetch_interval:
+                return None
+        # imported on first use: only the OAuth callback needs it
+        import httpx
+
+        try:
+            await self._refresh()
+        except (httpx.HTTPError, ValueError, KeyError):
+            # keep serving keys we already have rather than failing every login
+            logger.exception("Fetching JWKS from %s failed", self.url)
+        return self._keys.get(kid)
+
+    # ❗️the provider is failing: don't retry on every login until it is back
+    def _backing_off(self, now: float) -> bool:
+        return self._failed and now - self._attempted_at < self.min_refetch_interval
+
+    def _start_fetch(self) -> asyncio.Task:
+        self._attempted_at = time.monotonic()
+        self._inflight = asyncio.create_task(self._fetch())
+        self._inflight.add_done_callback(self._fetch_done)
+        return self._inflight
+
+    def _fetch_done(self, task: asyncio.Task):
+        self._inflight = None
+        self._failed = task.cancelled() or task.exception() is not None
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Background JWKS refresh from %s failed: %r", self.url, task.exception())
+
+    async def _refresh(self):
+        task = self._inflight or self._start_fetch()
+        await asyncio.shield(task)
+
+    async def _fetch(self):
+        import httpx
+
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+            keys = {key["kid"]: key for key in response.json()["keys"]}
+        match = MAX_AGE_RE.search(response.headers.get("cache-control", ""))
+        max_age = int(match.group(1)) if match else self.default_max_age
+        self.fetches += 1
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+        self._expires_at = self._fetched_at + max_age
+
+
+google_jwks = JWKSKeyStore(
+    url=settings.GOOGLE_JWKS["URL"],
+    timeout=settings.GOOGLE_JWKS["TIMEOUT"],
+    default_max_age=settings.GOOGLE_JWKS["DEFAULT_MAX_AGE"],
+    min_refetch_interval=settings.GOOGLE_JWKS["MIN_REFETCH_INTERVAL"],
+)
@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import math
+import random
+import string
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.models import F
+
+from .background import BackgroundTask
+from .db import db_pool
+from .models import ShortKeyPool, ShortKeySequence, URLMapping
+
+logger = logging.getLogger(__name__)
+
+BASE62 = string.ascii_letters + string.digits
+
+
+def base62_encode(number: int, length: int) -> str:
+    chars = []
+    while number:
+        number, rem = divmod(number, 62)
+        chars.append(BASE62[rem])
+    return ''.join(reversed(chars)).rjust(length, BASE62[0])
+
+
+def base62_decode(key: str) -> int:
+    number = 0
+    for char in key:
+        number = number * 62 + BASE62.index(char)
+    return number
+
+
+# ✅Legacy strategy: random keys, the caller must check for collisions
+class RandomKeyAllocator:
+    unique = False
+
+    def __init__(self, length: int = 6):
+        self.length = length
+
+    def allocate(self) -> str:
+        return ''.join(random.choice(BASE62) for _ in range(self.length))
+
+
+# ✅Sequence strategy: base62 of a monotonic id, unique by construction.
+# Each worker reserves a block of ids from ShortKeySequence and hands them out
+# from memory, so the database is only touched once per BLOCK_SIZE keys.
+# Keys are fixed-width; at the default LENGTH of 7 they can never collide
+# with the 6-character keys minted by the random strategy.
+class SequenceKeyAllocator:
+    unique = True
+
+    def __init__(self, length: int = 7, block_size: int = 1000, obfuscate: bool = True,
+                 multiplier: int = 1, offset: int = 0, name: str = "short_key"):
+        self.length = length
+        self.block_size = block_size
+        self.name = name
+        self.space = 62 ** length
+        self.obfuscate = obfuscate
+        if obfuscate and math.gcd(multiplier, 62) != 1:
+            raise ImproperlyConfigured("SHORT_KEY_ALLOCATOR MULTIPLIER must be coprime with 62")
+        self.multiplier = multiplier % self.space
+        self.offset = offset % self.space
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    # Call outside of any transaction: the reservation must commit on its own,
+    # or a rollback would let another worker reserve the same ids again.
+    # The UPDATE comes first so the row (on SQLite, the database) is write-locked
+    # before anything is read; a read-then-write can't be upgraded under contention.
+    def _reserve_block(self) -> int:
+        with transaction.atomic():
+            sequence = ShortKeySequence.objects.filter(name=self.name)
+            if not sequence.update(next_value=F('next_value') + self.block_size):
+                _, created = ShortKeySequence.objects.get_or_create(
+                    name=self.name, defaults={'next_value': self.block_size}
+                )
+                if created:
+                    return 0
+                sequence.update(next_value=F('next_value') + self.block_size)
+            end = sequence.values_list('next_value', flat=True).get()
+        return end - self.block_size
+
+    def _next_id(self) -> int:
+        with self._lock:
+            if self._next >= self._end:
+                self._next = self._reserve_block()
+                self._end = self._next + self.block_size
+            number = self._next
+            self._next += 1
+        if number >= self.space:
+            raise RuntimeError(f"Short key space of length {self.length} is exhausted")
+        return number
+
+    # reversible bijection on [0, 62**length): an affine map with an invertible multiplier
+    def scramble(self, number: int) -> int:
+        return (number * self.multiplier + self.offset) % self.space
+
+    def unscramble(self, number: int) -> int:
+        return (number - self.offset) * pow(self.multiplier, -1, self.space) % self.space
+
+    def allocate(self) -> str:
+        number = self._next_id()
+        if self.obfuscate:
+            number = self.scramble(number)
+        return base62_encode(number, self.length)
+
+    def key_to_id(self, key: str) -> int:
+        number = base62_decode(key)
+        return self.unscramble(number) if self.obfuscate else number
+
+
+# ✅Pool strategy: random keys generated and validated ahead of time.
+# ShortKeyPool holds the reservoir; a background task tops it up past
+# LOW_WATER and each worker claims CLAIM_BATCH keys at a time. Claimed rows
+# stay in the table, so its unique constraint keeps a key that was claimed
+# but never used from being generated again.
+class KeyPoolAllocator:
+    unique = True
+    INSERT_CHUNK_SIZE = 1000
+
+    def __init__(self, length: int = 6, low_water: int = 5000, refill_size: int = 20000, claim_batch: int = 100):
+        self.length = length
+        self.low_water = low_water
+        self.refill_size = refill_size
+        self.claim_batch = claim_batch
+        self._keys = deque()
+        self._lock = threading.Lock()
+        self._generator = RandomKeyAllocator(length=length)
+
+    def refill(self) -> int:
+        available = ShortKeyPool.objects.filter(claimed=False).count()
+        if available >= self.low_water:
+            return 0
+        candidates = {self._generator.allocate() for _ in range(self.refill_size)}
+        taken = set(URLMapping.objects.filter(short_url__in=candidates).values_list('short_url', flat=True))
+        keys = list(candidates - taken)
+        # ✅ON CONFLICT DO NOTHING ... RETURNING counts the rows actually inserted;
+        # bulk_create(ignore_conflicts=True) only reports the rows it tried
+        added = 0
+        with connection.cursor() as cursor:
+            for start in range(0, len(keys), self.INSERT_CHUNK_SIZE):
+                chunk = keys[start:start + self.INSERT_CHUNK_SIZE]
+                cursor.execute(
+                    f"INSERT INTO {ShortKeyPool._meta.db_table} (key, claimed) "
+                    f"VALUES {', '.join(['(%s, %s)'] * len(chunk))} "
+                    "ON CONFLICT (key) DO NOTHING RETURNING id",
+                    [param for key in chunk for param in (key, False)],
+                )
+                added += len(cursor.fetchall())
+        return added
+
+    # ❗️One UPDATE ... RETURNING, so claiming is atomic on every backend: SQLite
+    # has no SELECT ... FOR UPDATE, and a select-then-update there let two workers
+    # claim the same keys. The outer `claimed` check makes Postgres skip a row
+    # another worker claimed while this statement waited on it.
+    def _claim_batch(self) -> list:
+        table = ShortKeyPool._meta.db_table
+        skip_locked = " FOR UPDATE SKIP LOCKED" if connection.features.has_select_for_update_skip_locked else ""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET claimed = %s WHERE claimed = %s AND id IN "
+                f"(SELECT id FROM {table} WHERE claimed = %s LIMIT %s{skip_locked}) "
+                "RETURNING key",
+                [True, False, False, self.claim_batch],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def allocate(self) -> str:
+        with self._lock:
+            if self._keys:
+                return self._keys.popleft()
+        # ❗️Claimed without holding the lock, so an inline refill doesn't stall
+        # every other encode in this worker; extra keys just wait in the deque
+        keys = self._claim_batch()
+        if not keys:
+            # the background refill fell behind; top up inline rather than fail
+            logger.warning("Short key pool is empty, refilling on the request path")
+            self.refill()
+            keys = self._claim_batch()
+        if not keys:
+            raise RuntimeError("Short key pool is empty and could not be refilled")
+        with self._lock:
+            self._keys.extend(keys)
+            return self._keys.popleft()
+
+
+# ♻️Keep the pool above its low-water mark
+async def maintain_key_pool(allocator: KeyPoolAllocator):
+    while True:
+        try:
+            added = await db_pool.run(allocator.refill)
+            if added:
+                logger.info("Short key pool refilled with %s keys", added)
+        except Exception:
+            logger.exception("Short key pool refill failed")
+        await asyncio.sleep(settings.SHORT_KEY_POOL["REFILL_INTERVAL"])
+
+
+# started with the allocator: start_key_pool_refill(allocator)
+key_pool_refill = BackgroundTask(maintain_key_pool)
+start_key_pool_refill = key_pool_refill.start
+
+
+def get_key_allocator():
+    config = settings.SHORT_KEY_ALLOCATOR
+    strategy = config["STRATEGY"]
+    if strategy == "random":
+        return RandomKeyAllocator(length=config.get("LENGTH", 6))
+    if strategy == "sequence":
+        return SequenceKeyAllocator(
+            length=config.get("LENGTH", 7),
+            block_size=config.get("BLOCK_SIZE", 1000),
+            obfuscate=config.get("OBFUSCATE", True),
+            multiplier=config.get("MULTIPLIER", 1),
+            offset=config.get("OFFSET", 0),
+        )
+    if strategy == "pool":
+        pool = settings.SHORT_KEY_POOL
+        return KeyPoolAllocator(
+            length=pool["LENGTH"],
+            low_water=pool["LOW_WATER"],
+            refill_size=pool["REFILL_SIZE"],
+            claim_batch=pool["CLAIM_BATCH"],
+        )
+    raise ImproperlyConfigured(f"Unknown SHORT_KEY_ALLOCATOR strategy: {strategy!r}")
@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+from .models import UserURLMapping
+
+# Only the columns the response needs, joined in the same query
+LINK_COLUMNS = (
+    'id',
+    'created_at',
+    'url_mapping__long_url',
+    'url_mapping__short_url',
+    'title',
+    'url_mapping__created_at',
+    'url_mapping__created_by__username',
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime, link_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), link_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, link_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(link_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+# Same text as pydantic's datetime serialization (URLMappingSchema): UTC as "Z"
+def json_datetime(value: datetime) -> str:
+    text = value.isoformat()
+    return text[:-6] + "Z" if text.endswith("+00:00") else text
+
+
+def link_row_to_dict(row: tuple) -> dict:
+    _, _, long_url, short_url, title, created_at, created_by = row
+    return {
+        "long_url": long_url,
+        "short_url": short_url,
+        "title": title,
+        "created_at": json_datetime(created_at),
+        "created_by": created_by,
+    }
+
+
+# ✅One keyset page, newest first, served by the (user, created_at, id) index
+async def fetch_links(user_id: int, after: tuple | None, limit: int) -> list:
+    links = UserURLMapping.objects.filter(user_id=user_id)
+    if after is not None:
+        created_at, link_id = after
+        links = links.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=link_id))
+    links = links.order_by('-created_at', '-id').values_list(*LINK_COLUMNS)[:limit]
+    return [row async for row in links]
+
+
+# ✅The whole list as one JSON array, fetched page by page, so memory stays flat
+async def stream_links(user_id: int, chunk_size: int):
+    yield b"["
+    after = None
+    first = True
+    while True:
+        rows = await fetch_links(user_id, after, chunk_size)
+        if rows:
+            body = ",".join(json.dumps(link_row_to_dict(row)) for row in rows)
+            yield (body if first else "," + body).encode()
+            first = False
+        if len(rows) < chunk_size:
+            break
+        after = (rows[-1][1], rows[-1][0])
+    yield b"]"
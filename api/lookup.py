@@ -0,0 +1,96 @@
+import asyncio
+import time
+import weakref
+
+from django.conf import settings
+
+from .bloom import might_exist
+from .cache import aget, aset, get_async_redis, make_key, short_key_l1
+from .metrics import record_cache
+from .models import URLMapping
+
+# Cached in place of a long URL for keys that do not exist
+MISSING = ""
+
+# ✅Single flight: one lookup per short key at a time in this worker, the
+# other requests for the key wait on it. Per event loop, like the Redis client.
+_in_flight = weakref.WeakKeyDictionary()
+
+
+# ✅Resolve a short key to its long URL without leaving the event loop on a cache hit
+async def resolve_short_key(short_key: str) -> str | None:
+    # 1️⃣L1: in-process, no network
+    long_url = short_key_l1.get(short_key)
+    record_cache("l1", "short", long_url is not None)
+    if long_url is not None:
+        return long_url or None
+
+    pending = _in_flight.setdefault(asyncio.get_running_loop(), {})
+    lookup = pending.get(short_key)
+    if lookup is None:
+        lookup = pending[short_key] = asyncio.ensure_future(_lookup(short_key))
+        lookup.add_done_callback(lambda done: _lookup_done(pending, short_key, done))
+    # ❗️shielded: a waiter that goes away (client disconnect) must not cancel it for the others
+    return await asyncio.shield(lookup)
+
+
+def _lookup_done(pending: dict, short_key: str, lookup: asyncio.Future):
+    pending.pop(short_key, None)
+    if not lookup.cancelled():
+        lookup.exception()  # retrieved here in case every waiter was cancelled
+
+
+async def _lookup(short_key: str) -> str | None:
+    negative_ttl = settings.SHORT_KEY_NEGATIVE_TTL
+
+    # 2️⃣L2: Redis
+    cache_key = f"short:{short_key}"
+    long_url = await aget(cache_key)
+    record_cache("redis", "short", long_url is not None)
+    if long_url is not None:
+        short_key_l1.set(short_key, long_url, ttl=None if long_url else negative_ttl)
+        return long_url or None
+
+    # 3️⃣Bloom filter: a definite miss never reaches the database.
+    # It is checked after Redis because `encode` primes `short:{key}` there,
+    # which covers keys minted by other workers since the last filter sync.
+    if not might_exist(short_key):
+        short_key_l1.set(short_key, MISSING, ttl=negative_ttl)
+        return None
+
+    # 4️⃣Database, optionally behind a short Redis lock shared by all workers
+    config = settings.SHORT_KEY_SINGLE_FLIGHT
+    locked = False
+    if config["CROSS_WORKER_LOCK"]:
+        locked, long_url = await _lock_or_wait(cache_key, config)
+        if long_url is not None:
+            short_key_l1.set(short_key, long_url, ttl=None if long_url else negative_ttl)
+            return long_url or None
+
+    try:
+        long_url = await URLMapping.objects.filter(short_url=short_key).values_list('long_url', flat=True).afirst()
+        if long_url:
+            await aset(cache_key, long_url)
+            short_key_l1.set(short_key, long_url)
+            return long_url
+
+        await aset(cache_key, MISSING, timeout=negative_ttl)
+        short_key_l1.set(short_key, MISSING, ttl=negative_ttl)
+        return None
+    finally:
+        if locked:
+            await get_async_redis().delete(make_key(f"lock:{cache_key}"))
+
+
+# Take the lock, or wait up to LOCK_WAIT for the worker holding it to fill the cache.
+# Returns (locked, cached value); with no value this worker queries the database itself.
+async def _lock_or_wait(cache_key: str, config: dict) -> tuple:
+    if await get_async_redis().set(make_key(f"lock:{cache_key}"), 1, nx=True, px=int(config["LOCK_TTL"] * 1000)):
+        return True, None
+    deadline = time.monotonic() + config["LOCK_WAIT"]
+    while time.monotonic() < deadline:
+        await asyncio.sleep(config["POLL_INTERVAL"])
+        long_url = await aget(cache_key)
+        if long_url is not None:
+            return False, long_url
+    return False, None  # the lock holder is slow or gone, query anyway
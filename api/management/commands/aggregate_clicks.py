@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.rollups import aggregate_pending_clicks
+
+
+class Command(BaseCommand):
+    help = "Fold raw click events into the hourly and daily rollups"
+
+    def handle(self, *args, **options):
+        folded = aggregate_pending_clicks()
+        self.stdout.write(self.style.SUCCESS(f"Folded {folded} clicks into rollups"))
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Import a module in a fresh interpreter with -X importtime and report where the startup time goes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--module", default="myproject.asgi", help="module a worker imports on start")
+        parser.add_argument("--top", type=int, default=20)
+
+    def handle(self, *args, **options):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {options['module']}"],
+            capture_output=True, text=True, env=os.environ.copy(),
+        )
+        if result.returncode:
+            raise CommandError(f"Importing {options['module']} failed:\n{result.stderr[-2000:]}")
+
+        # lines look like "import time:  self [us] | cumulative | imported package", nesting by indent
+        packages = defaultdict(int)
+        modules = []
+        total = 0
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "[us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+            packages[name.strip().split(".")[0]] += self_us
+            modules.append((cumulative_us, self_us, name.rstrip()))
+            if not name[1:].startswith(" "):
+                total += cumulative_us
+
+        self.stdout.write(f"Imports for {options['module']} took {total / 1000:.1f} ms\n")
+        self.stdout.write(f"{'package':<40} {'ms':>8} {'share':>7}")
+        for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:options["top"]]:
+            self.stdout.write(f"{package:<40} {self_us / 1000:8.1f} {self_us / total:7.1%}")
+
+        self.stdout.write(f"\n{'slowest imports (including their own imports)':<60} {'ms':>8}")
+        for cumulative_us, _, name in sorted(modules, reverse=True)[:options["top"]]:
+            self.stdout.write(f"{name:<60} {cumulative_us / 1000:8.1f}")
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.profiling import make_profile_token
+
+
+class Command(BaseCommand):
+    help = "Print a signed header that turns on profiling for the requests carrying it"
+
+    def handle(self, *args, **options):
+        config = settings.PROFILING
+        self.stdout.write(f"{config['HEADER']}: {make_profile_token()}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Valid for {config['TOKEN_MAX_AGE']} seconds; profiles are written to {config['DIRECTORY']}"
+        ))
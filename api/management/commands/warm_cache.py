@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.warmup import warm_short_keys
+
+
+class Command(BaseCommand):
+    help = "Preload the most clicked and most recent short keys into Redis"
+
+    def add_arguments(self, parser):
+        config = settings.CACHE_WARMUP
+        parser.add_argument("--limit", type=int, default=config["LIMIT"])
+        parser.add_argument("--days", type=int, default=config["DAYS"])
+        parser.add_argument("--chunk-size", type=int, default=config["CHUNK_SIZE"])
+
+    def handle(self, *args, **options):
+        def progress(done, total):
+            self.stdout.write(f"{done}/{total} short keys loaded")
+
+        loaded = warm_short_keys(options["limit"], options["days"], options["chunk_size"], progress)
+        self.stdout.write(self.style.SUCCESS(f"Warmed {loaded} short keys"))
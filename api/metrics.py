@@ -0,0 +1,181 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from starlette.routing import Mount
+
+from .middleware import StatusRecorder
+
+# ✅In-process metrics for the Prometheus text format (see api/metrics_endpoint.py).
+# Each worker keeps its own; Prometheus scrapes and sums them per instance.
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{{{_labels(self.labels, labels)}}} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple, buckets: list):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = sorted(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # per-bucket counts (the last one is +Inf), sum
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            label_str = _labels(self.labels, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ["+Inf"], counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_str},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_str}}} {total}")
+            lines.append(f"{self.name}_count{{{label_str}}} {cumulative}")
+        return lines
+
+
+config = settings.METRICS
+
+http_requests = Counter(
+    "http_requests_total", "Requests by route, method and status", ("route", "method", "status"),
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Request latency by route", ("route", "method"), config["LATENCY_BUCKETS"],
+)
+db_queries_per_request = Histogram(
+    "db_queries_per_request", "ORM queries run while serving a request", ("route",), config["QUERY_COUNT_BUCKETS"],
+)
+db_query_duration = Histogram(
+    "db_query_duration_seconds_per_request", "Time spent in ORM queries per request", ("route",),
+    config["LATENCY_BUCKETS"],
+)
+db_queries = Counter(
+    "db_queries_total", "ORM queries; route is 'background' outside of requests", ("route",),
+)
+cache_requests = Counter(
+    "cache_requests_total", "Cache lookups by tier (l1, redis), key family and result", ("tier", "family", "result"),
+)
+
+REGISTRY = [http_requests, http_request_duration, db_queries_per_request, db_query_duration, db_queries, cache_requests]
+
+
+def record_cache(tier: str, family: str, hit: bool):
+    cache_requests.inc((tier, family, "hit" if hit else "miss"))
+
+
+# ✅Per-request ORM accounting. The stats object lives in a context variable,
+# which asgiref's sync_to_async, the database pool and Starlette's threadpool carry over to
+# the worker thread, so queries are attributed to the request that caused them.
+class RequestStats:
+    __slots__ = ("queries", "query_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+_request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def _time_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats = _request_stats.get()
+        if stats is None:
+            db_queries.inc(("background",))
+        else:
+            stats.queries += 1
+            stats.query_seconds += time.perf_counter() - start
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    connection.execute_wrappers.append(_time_query)
+
+
+def install_query_timer():
+    connection_created.connect(_on_connection_created, dispatch_uid="metrics_query_timer")
+
+
+# ✅Raw ASGI middleware timing every HTTP request.
+# The route label is the matched path template ("/api/{short_key}"), found from
+# the endpoint the routers leave in the scope; anything else is "unmatched",
+# so label cardinality stays bounded.
+class MetricsMiddleware:
+    def __init__(self, app, root_app=None):
+        self.app = app
+        self.root_app = root_app
+        self._routes = None
+
+    def _route_templates(self) -> dict:
+        templates = {}
+
+        def walk(routes, prefix):
+            for route in routes:
+                if isinstance(route, Mount):
+                    templates[route.app] = prefix + route.path
+                    walk(getattr(route.app, "routes", []), prefix + route.path)
+                elif hasattr(route, "endpoint"):
+                    templates[route.endpoint] = prefix + route.path
+
+        walk(self.root_app.routes, "")
+        return templates
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        recorder = StatusRecorder(send)
+        try:
+            await self.app(scope, receive, recorder)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_stats.reset(token)
+            if self._routes is None:
+                self._routes = self._route_templates()
+            route = self._routes.get(scope.get("endpoint"), "unmatched")
+            method = scope["method"]
+            http_requests.inc((route, method, recorder.status))
+            http_request_duration.observe((route, method), elapsed)
+            db_queries_per_request.observe((route,), stats.queries)
+            db_query_duration.observe((route,), stats.query_seconds)
+            db_queries.inc((route,), stats.queries)
@@ -0,0 +1,45 @@
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+from .auth import password_hash_pool
+from .cache import redis_pool_stats, short_key_l1
+from .clicks import click_buffer
+from .db import db_pool
+from .enrichment import title_enrichment
+from .jwks import google_jwks
+from .metrics import REGISTRY
+from .traffic import trace_buffer
+
+# Components that already keep their own counters, exported as <prefix>_<key>.
+# Keys in the third field only ever grow and are exported as <prefix>_<key>_total
+# counters, so rate() and restarts work; everything else is a gauge.
+COMPONENT_STATS = (
+    ("short_key_l1", short_key_l1.stats, {"hits", "misses", "evictions"}),
+    ("click_buffer", click_buffer.stats, {"recorded", "dropped", "flushed", "failed"}),
+    ("password_hash_pool", password_hash_pool.stats, {"completed", "rejected", "wait_seconds"}),
+    ("title_enrichment", title_enrichment.stats, {"recorded", "dropped", "enriched", "failed"}),
+    ("trace_buffer", trace_buffer.stats, {"recorded", "dropped"}),
+    ("google_jwks", lambda: {"fetches": google_jwks.fetches}, {"fetches"}),
+    ("db_pool", db_pool.stats, {"completed", "recycled", "reaped", "wait_seconds"}),
+    ("redis_pool", redis_pool_stats, set()),
+)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    for prefix, stats, counters in COMPONENT_STATS:
+        for key, value in stats().items():
+            if key in counters:
+                name, kind = f"{prefix}_{key}_total", "counter"
+            else:
+                name, kind = f"{prefix}_{key}", "gauge"
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# ⛳️GET /metrics on the outer app, outside of /api and /auth
+async def metrics_endpoint(request: Request):
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,12 @@
+# ✅Wraps an ASGI `send` and keeps the response status for middlewares that
+# report on the request afterwards. 500 until a response starts: an app that
+# raises before sending anything ends up as a 500 from the server.
+class StatusRecorder:
+    def __init__(self, send):
+        self._send = send
+        self.status = 500
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        await self._send(message)
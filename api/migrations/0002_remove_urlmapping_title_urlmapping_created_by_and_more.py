@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-16 22:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='urlmapping',
+            name='title',
+        ),
+        migrations.AddField(
+            model_name='urlmapping',
+            name='created_by',
+            field=models.ForeignKey(default=None, on_delete=django.db.models.deletion.CASCADE, related_name='url_mappings', to=settings.AUTH_USER_MODEL),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='UserURLMapping',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(blank=True, max_length=255)),
+                ('url_mapping', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.urlmapping')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'url_mapping')},
+            },
+        ),
+    ]
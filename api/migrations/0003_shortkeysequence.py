@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-16 22:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_remove_urlmapping_title_urlmapping_created_by_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShortKeySequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('next_value', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-16 22:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_shortkeysequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShortKeyPool',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=10, unique=True)),
+                ('claimed', models.BooleanField(db_index=True, default=False)),
+            ],
+        ),
+    ]
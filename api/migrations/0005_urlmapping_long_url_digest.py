@@ -0,0 +1,57 @@
+# Generated by Django 5.0.6 on 2026-10-16 23:05
+
+import hashlib
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def backfill_long_url_digest(apps, schema_editor):
+    URLMapping = apps.get_model('api', 'URLMapping')
+    last_id = 0
+    while True:
+        rows = list(
+            URLMapping.objects.filter(id__gt=last_id, long_url_digest__isnull=True)
+            .order_by('id').only('id', 'long_url')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1].id
+        for row in rows:
+            row.long_url_digest = hashlib.sha256(row.long_url.encode()).hexdigest()
+        # Duplicate long URLs keep a NULL digest so the unique index can be built;
+        # the lowest id (the one encode has always picked) stays canonical.
+        taken = set(
+            URLMapping.objects.filter(long_url_digest__in=[row.long_url_digest for row in rows])
+            .values_list('long_url_digest', flat=True)
+        )
+        batch = []
+        for row in rows:
+            if row.long_url_digest not in taken:
+                taken.add(row.long_url_digest)
+                batch.append(row)
+        URLMapping.objects.bulk_update(batch, ['long_url_digest'])
+
+
+class Migration(migrations.Migration):
+    # commit the backfill batch by batch instead of in one long transaction
+    atomic = False
+
+    dependencies = [
+        ('api', '0004_shortkeypool'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='urlmapping',
+            name='long_url_digest',
+            field=models.CharField(db_index=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_long_url_digest, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='urlmapping',
+            name='long_url_digest',
+            field=models.CharField(editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
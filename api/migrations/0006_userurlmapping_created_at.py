@@ -0,0 +1,36 @@
+# Generated by Django 5.0.6 on 2026-10-16 23:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_created_at(apps, schema_editor):
+    # existing links take the time their URL was first shortened
+    URLMapping = apps.get_model('api', 'URLMapping')
+    UserURLMapping = apps.get_model('api', 'UserURLMapping')
+    UserURLMapping.objects.update(
+        created_at=models.Subquery(
+            URLMapping.objects.filter(id=models.OuterRef('url_mapping_id')).values('created_at')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_urlmapping_long_url_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userurlmapping',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='userurlmapping',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='userurlmapping_keyset_idx'),
+        ),
+    ]
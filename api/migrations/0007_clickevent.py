@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-16 22:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_userurlmapping_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClickEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('short_url', models.CharField(max_length=10)),
+                ('clicked_at', models.DateTimeField()),
+                ('referrer', models.CharField(blank=True, max_length=255)),
+                ('ua_hash', models.CharField(blank=True, max_length=16)),
+            ],
+        ),
+    ]
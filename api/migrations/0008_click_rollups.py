@@ -0,0 +1,47 @@
+# Generated by Django 5.0.6 on 2026-10-16 22:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_clickevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('seen_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ClickRollupDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateField()),
+                ('clicks', models.BigIntegerField(default=0)),
+                ('url_mapping', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.urlmapping')),
+            ],
+            options={
+                'unique_together': {('url_mapping', 'bucket')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ClickRollupHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('clicks', models.BigIntegerField(default=0)),
+                ('url_mapping', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.urlmapping')),
+            ],
+            options={
+                'unique_together': {('url_mapping', 'bucket')},
+            },
+        ),
+    ]
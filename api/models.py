@@ -1,4 +1,6 @@
+import hashlib
 from datetime import datetime
+from typing import List, Optional
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from pydantic import BaseModel, EmailStr
@@ -12,13 +14,24 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.username
 
+# fixed-width, indexable stand-in for a long URL
+def long_url_digest(long_url: str) -> str:
+    return hashlib.sha256(long_url.encode()).hexdigest()
+
 # table2️⃣
 class URLMapping(models.Model):
     long_url = models.URLField()
+    # encode dedupes on this; NULL only for duplicate rows that predate the column
+    long_url_digest = models.CharField(max_length=64, unique=True, null=True, editable=False)
     short_url = models.CharField(max_length=10, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='url_mappings')
 
+    def save(self, *args, **kwargs):
+        if self.long_url_digest is None:
+            self.long_url_digest = long_url_digest(self.long_url)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.short_url
 
@@ -27,9 +40,66 @@ class UserURLMapping(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     url_mapping = models.ForeignKey(URLMapping, on_delete=models.CASCADE)
     title = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = (('user', 'url_mapping'),)
+        indexes = [
+            # keyset pagination of GET /links
+            models.Index(fields=['user', '-created_at', '-id'], name='userurlmapping_keyset_idx'),
+        ]
+
+# table4️⃣ id counters for sequence-based short keys
+class ShortKeySequence(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+# table5️⃣ pre-generated short keys for the "pool" allocator
+class ShortKeyPool(models.Model):
+    key = models.CharField(max_length=10, unique=True)
+    claimed = models.BooleanField(default=False, db_index=True)
+
+    def __str__(self):
+        return self.key
+
+# table6️⃣ raw redirects, written in batches by the click flusher (api/clicks.py)
+class ClickEvent(models.Model):
+    short_url = models.CharField(max_length=10)
+    clicked_at = models.DateTimeField()
+    referrer = models.CharField(max_length=255, blank=True)
+    ua_hash = models.CharField(max_length=16, blank=True)
+
+    def __str__(self):
+        return self.short_url
+
+# table7️⃣ click rollups, maintained incrementally from ClickEvent (api/rollups.py)
+class ClickRollupHourly(models.Model):
+    url_mapping = models.ForeignKey(URLMapping, on_delete=models.CASCADE)
+    bucket = models.DateTimeField()
+    clicks = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = (('url_mapping', 'bucket'),)
+
+class ClickRollupDaily(models.Model):
+    url_mapping = models.ForeignKey(URLMapping, on_delete=models.CASCADE)
+    bucket = models.DateField()
+    clicks = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = (('url_mapping', 'bucket'),)
+
+# how far ClickEvent has been folded into the rollups
+class RollupWatermark(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    seen_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
 
 class URLMappingSchema(BaseModel):
     long_url: str
@@ -41,6 +111,10 @@ class URLMappingSchema(BaseModel):
     class Config:
         orm_mode = True
 
+class LinksPage(BaseModel):
+    items: List[URLMappingSchema]
+    next_cursor: Optional[str]
+
 class UserCreate(BaseModel):
     username: str
     password: str
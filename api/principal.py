@@ -0,0 +1,40 @@
+from dataclasses import asdict, dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import aget, aset
+from .metrics import record_cache
+from .models import CustomUser
+
+
+# ✅What protected endpoints need to know about the caller, cheap to cache
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    username: str
+    disabled: bool
+
+
+def principal_cache_key(username: str) -> str:
+    return f"principal:{username}"
+
+
+# Redis first, then the database; stays on the event loop on a hit
+async def get_principal(username: str) -> Principal | None:
+    cache_key = principal_cache_key(username)
+    cached = await aget(cache_key)
+    record_cache("redis", "principal", cached is not None)
+    if cached is not None:
+        return Principal(**cached)
+
+    user = await CustomUser.objects.filter(username=username).values('id', 'username', 'disabled').afirst()
+    if user is None:
+        return None
+    principal = Principal(**user)
+    await aset(cache_key, asdict(principal), timeout=settings.AUTH_PRINCIPAL["CACHE_TTL"])
+    return principal
+
+
+def invalidate_principal(username: str):
+    cache.delete(principal_cache_key(username))
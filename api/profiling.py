@@ -0,0 +1,184 @@
+import itertools
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db.backends.signals import connection_created
+
+from .middleware import StatusRecorder
+
+logger = logging.getLogger(__name__)
+
+TOKEN_SALT = "api.profiling"
+
+
+def make_profile_token() -> str:
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign("profile")
+
+
+def valid_profile_token(token: str, max_age: int) -> bool:
+    try:
+        return signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=max_age) == "profile"
+    except signing.BadSignature:
+        return False
+
+
+# Where idle pool threads sit; their samples are left out
+IDLE_FRAMES = {("threading.py", "wait"), ("queue.py", "get"), ("thread.py", "_worker"), ("db.py", "_worker")}
+
+
+# ✅Statistical profiler: a thread samples every other thread's stack each
+# `interval` seconds and counts them as collapsed stacks ("a;b;c 12"), the
+# input format of flamegraph.pl, speedscope and inferno.
+# Samples on the event loop thread include whatever else the loop ran meanwhile.
+class StackSampler:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+
+# SQL of the request being profiled; text only, parameters are never written
+_sql_log: ContextVar[list | None] = ContextVar("profile_sql_log", default=None)
+
+
+def _log_query(execute, sql, params, many, context):
+    log = _sql_log.get()
+    if log is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if len(log) < settings.PROFILING["MAX_SQL_QUERIES"]:
+            log.append((time.perf_counter() - start, sql))
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    connection.execute_wrappers.append(_log_query)
+
+
+PROFILE_SUFFIXES = (".folded", ".sql.txt")
+
+
+def write_profile(directory: str, name: str, stacks: Counter, sql_log: list, summary: str, max_bytes: int):
+    folded = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common()).encode()
+    sql = (summary + "".join(f"{seconds * 1000:9.2f} ms  {statement}\n" for seconds, statement in sql_log)).encode()
+    size = len(folded) + len(sql)
+    if size > max_bytes:
+        logger.warning("Profile %s is larger than PROFILING MAX_DIRECTORY_BYTES, not written", name)
+        return
+    os.makedirs(directory, exist_ok=True)
+
+    # ❗️Size cap: the oldest profiles go first, both files of one together.
+    # Only our own files count; anything else in DIRECTORY is left alone.
+    profiles = {}
+    for entry in os.scandir(directory):
+        suffix = next((suffix for suffix in PROFILE_SUFFIXES if entry.name.endswith(suffix)), None)
+        if suffix and entry.is_file():
+            profiles.setdefault(entry.name[:-len(suffix)], []).append(entry)
+    used = size + sum(entry.stat().st_size for entries in profiles.values() for entry in entries)
+    for entries in sorted(profiles.values(), key=lambda entries: max(entry.stat().st_mtime for entry in entries)):
+        if used <= max_bytes:
+            break
+        for entry in entries:
+            used -= entry.stat().st_size
+            os.remove(entry.path)
+
+    with open(os.path.join(directory, f"{name}.folded"), "wb") as f:
+        f.write(folded)
+    with open(os.path.join(directory, f"{name}.sql.txt"), "wb") as f:
+        f.write(sql)
+
+
+# ✅Opt-in per-request profiling. A request is profiled when it carries a valid
+# signed token in HEADER (see `manage.py profile_token`) or, with SAMPLE_EVERY = N,
+# for one request in N. One request is profiled at a time; the others skip it.
+# Everything else costs a header lookup. Off unless PROFILING["ENABLED"].
+class ProfilingMiddleware:
+    def __init__(self, app, header: str, sample_every: int, token_max_age: int, interval: float,
+                 directory: str, max_bytes: int):
+        self.app = app
+        self.header = header.lower().encode("latin-1")
+        self.sample_every = sample_every
+        self.token_max_age = token_max_age
+        self.interval = interval
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._requests = itertools.count(1)
+        self._profiles = itertools.count(1)
+        self._busy = threading.Lock()
+        connection_created.connect(_on_connection_created, dispatch_uid="profiling_sql_log")
+
+    def _selected(self, scope) -> bool:
+        if self.sample_every and next(self._requests) % self.sample_every == 0:
+            return True
+        for name, value in scope["headers"]:
+            if name == self.header:
+                return valid_profile_token(value.decode("latin-1"), self.token_max_age)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._selected(scope) or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = StackSampler(self.interval)
+        sql_log = []
+        token = _sql_log.set(sql_log)
+        recorder = StatusRecorder(send)
+
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, recorder)
+        finally:
+            elapsed = time.perf_counter() - start
+            sampler.stop()
+            _sql_log.reset(token)
+            self._busy.release()
+            slug = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_")[:60] or "root"
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(self._profiles)}-{scope['method']}-{slug}"
+            summary = (
+                f"# {scope['method']} {scope['path']} -> {recorder.status} in {elapsed * 1000:.1f} ms, "
+                f"{len(sql_log)} queries in {sum(seconds for seconds, _ in sql_log) * 1000:.1f} ms\n"
+            )
+            try:
+                await sync_to_async(write_profile, thread_sensitive=False)(
+                    self.directory, name, sampler.stacks, sql_log, summary, self.max_bytes
+                )
+            except OSError:
+                logger.exception("Writing profile %s failed", name)
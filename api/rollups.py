@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .background import BackgroundTask
+from .db import db_pool
+from .models import ClickEvent, ClickRollupDaily, ClickRollupHourly, RollupWatermark, URLMapping
+
+logger = logging.getLogger(__name__)
+
+
+def _increment(model, rows: list, adapt):
+    # INSERT ... ON CONFLICT DO UPDATE SET clicks = clicks + EXCLUDED.clicks
+    table = model._meta.db_table
+    params = []
+    for mapping_id, bucket, clicks in rows:
+        params += [mapping_id, adapt(bucket), clicks]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (url_mapping_id, bucket, clicks) "
+            f"VALUES {', '.join(['(%s, %s, %s)'] * len(rows))} "
+            f"ON CONFLICT (url_mapping_id, bucket) DO UPDATE SET clicks = {table}.clicks + EXCLUDED.clicks",
+            params,
+        )
+
+
+# ✅Fold raw clicks into the hourly and daily rollups, each click at most once.
+# The watermark row is locked for the whole run, so rollups and watermark move
+# together and concurrent runs (other workers, cron) skip instead of double counting.
+# Only ids up to the highest id seen by the previous run are folded, which gives
+# a flush one run's worth of time (about INTERVAL) to commit after a higher id
+# became visible. ❗️A click committed later than that is behind the watermark
+# and never folded; flushes are a single short INSERT, so this needs a stalled one.
+def aggregate_clicks(batch_size: int = 50000) -> int:
+    with transaction.atomic():
+        watermark = (
+            RollupWatermark.objects.select_for_update(skip_locked=True)
+            .filter(name="clicks").first()
+        )
+        if watermark is None:
+            RollupWatermark.objects.get_or_create(name="clicks")
+            return 0
+
+        events = list(
+            ClickEvent.objects.filter(id__gt=watermark.last_id, id__lte=watermark.seen_id)
+            .order_by('id').values_list('id', 'short_url', 'clicked_at')[:batch_size]
+        )
+        if events:
+            mapping_ids = dict(
+                URLMapping.objects.filter(short_url__in={short_key for _, short_key, _ in events})
+                .values_list('short_url', 'id')
+            )
+            hourly, daily = Counter(), Counter()
+            for _, short_key, clicked_at in events:
+                mapping_id = mapping_ids.get(short_key)
+                if mapping_id is None:
+                    continue  # link deleted since the click
+                hourly[mapping_id, clicked_at.replace(minute=0, second=0, microsecond=0)] += 1
+                daily[mapping_id, clicked_at.date()] += 1
+            if hourly:
+                _increment(ClickRollupHourly, [(*key, n) for key, n in hourly.items()],
+                           connection.ops.adapt_datetimefield_value)
+                _increment(ClickRollupDaily, [(*key, n) for key, n in daily.items()],
+                           connection.ops.adapt_datefield_value)
+            watermark.last_id = events[-1][0]
+        else:
+            watermark.last_id = watermark.seen_id
+            watermark.seen_id = ClickEvent.objects.aggregate(newest=Max('id'))['newest'] or 0
+        watermark.save(update_fields=['last_id', 'seen_id'])
+        return len(events)
+
+
+def aggregate_pending_clicks() -> int:
+    # drain everything that is ready, batch by batch
+    total = 0
+    while True:
+        folded = aggregate_clicks(settings.CLICK_ROLLUPS["BATCH_SIZE"])
+        total += folded
+        if not folded:
+            return total
+
+
+# ♻️In-process aggregation loop, see CLICK_ROLLUPS["IN_PROCESS"]
+async def run_click_aggregator():
+    while True:
+        await asyncio.sleep(settings.CLICK_ROLLUPS["INTERVAL"])
+        try:
+            folded = await db_pool.run(aggregate_pending_clicks)
+            if folded:
+                logger.info("Folded %s clicks into rollups", folded)
+        except Exception:
+            logger.exception("Click aggregation failed")
+
+
+click_aggregator = BackgroundTask(run_click_aggregator)
+start_click_aggregator = click_aggregator.start
+
+
+# ✅Reads for the stats endpoints; they only ever touch the rollup tables
+async def link_stats(mapping_id: int, hours: int, days: int) -> dict:
+    now = timezone.now()
+    hourly = ClickRollupHourly.objects.filter(
+        url_mapping_id=mapping_id,
+        bucket__gte=now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1),
+    ).order_by('bucket').values_list('bucket', 'clicks')
+    daily = ClickRollupDaily.objects.filter(
+        url_mapping_id=mapping_id,
+        bucket__gte=now.date() - timedelta(days=days - 1),
+    ).order_by('bucket').values_list('bucket', 'clicks')
+    total = await ClickRollupDaily.objects.filter(url_mapping_id=mapping_id).aaggregate(total=Sum('clicks'))
+    return {
+        "total_clicks": total["total"] or 0,
+        "hourly": [{"hour": bucket.isoformat(), "clicks": clicks} async for bucket, clicks in hourly],
+        "daily": [{"day": bucket.isoformat(), "clicks": clicks} async for bucket, clicks in daily],
+    }
+
+
+async def user_stats(user_id: int, days: int, top: int) -> dict:
+    since = timezone.now().date() - timedelta(days=days - 1)
+    rollups = ClickRollupDaily.objects.filter(url_mapping__userurlmapping__user_id=user_id)
+    total = await rollups.aaggregate(total=Sum('clicks'))
+    recent = await rollups.filter(bucket__gte=since).aaggregate(total=Sum('clicks'))
+    top_links = (
+        rollups.filter(bucket__gte=since)
+        .values('url_mapping__short_url')
+        .annotate(clicks=Sum('clicks'))
+        .order_by('-clicks')[:top]
+    )
+    return {
+        "total_clicks": total["total"] or 0,
+        "recent_clicks": recent["total"] or 0,
+        "days": days,
+        "top_links": [
+            {"short_url": row["url_mapping__short_url"], "clicks": row["clicks"]} async for row in top_links
+        ],
+    }
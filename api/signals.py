@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import CustomUser
+from .principal import invalidate_principal
+
+
+# ✅Drop the cached principal whenever the user changes (e.g. gets disabled).
+# ❗️QuerySet.update() and bulk_update() send no signals: after disabling users
+# that way, call invalidate_principal() for each of them, or they keep access
+# for up to AUTH_PRINCIPAL["CACHE_TTL"] seconds.
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def user_changed(sender, instance, **kwargs):
+    invalidate_principal(instance.username)
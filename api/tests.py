@@ -1,3 +1,1197 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from asgiref.sync import async_to_sync
+from benchmarks.replay import load_trace, replay
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from fastapi import FastAPI
+
+from .auth import PasswordHashPool, PasswordHashPoolFull, create_access_token, decode_access_token
+from .auth_endpoints import auth_app, get_current_active_user, token_claims
+from .bloom import BloomFilter
+from .cache import LocalCache, aset, short_key_l1
+from .clicks import ClickBuffer, flush_clicks
+from .db import DatabasePool
+from .endpoints import Shortener, app as api_app, redirect_url
+from .enrichment import TitleEnrichmentQueue, enrich_titles
+from .fast_lane import RedirectFastLane
+from .jwks import JWKSKeyStore
+from .keygen import KeyPoolAllocator, SequenceKeyAllocator
+from .links import InvalidCursor, decode_cursor, encode_cursor
+from .lookup import MISSING, resolve_short_key
+from .metrics import (
+    MetricsMiddleware, RequestStats, _request_stats, _time_query, db_queries, http_requests, install_query_timer,
+)
+from .models import (
+    ClickEvent, ClickRollupDaily, ClickRollupHourly, CustomUser, ShortKeyPool, ShortKeySequence, URLMapping,
+    URLMappingSchema, UserURLMapping, long_url_digest,
+)
+from .principal import Principal, principal_cache_key
+from .profiling import write_profile
+from .rollups import aggregate_clicks, link_stats, user_stats
+from .titles import TitleFetcher
+from .warmup import SENTINEL_KEY, hot_short_keys, run_cache_warmup, warm_short_keys
+from .traffic import TraceBuffer, TrafficRecorder, flush_traces
+
+
+# Local stand-in for a provider's JWKS endpoint; the tests change its answers
+class StubJWKSServer:
+    def __init__(self):
+        self.keys = [{"kid": "k1", "kty": "RSA"}]
+        self.cache_control = "public, max-age=120"
+        self.status = 200
+        self.delay = 0.0
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.delay)
+                body = json.dumps({"keys": stub.keys}).encode()
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if stub.cache_control:
+                    self.send_header("Cache-Control", stub.cache_control)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/certs"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# Stands in for a module's `time` (api.jwks, api.cache) so tests can move its clock, not the event loop's
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+# Shared-cache in-memory SQLite fails a concurrent writer at once ("table is locked")
+# instead of waiting on it like a database file or Postgres does
+def skip_concurrent_writes_on_in_memory_sqlite(test):
+    if connection.vendor == "sqlite" and connection.is_in_memory_db():
+        test.skipTest("concurrent writers need a database file or Postgres")
+
+
+class JWKSKeyStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.stub = StubJWKSServer()
+        self.addCleanup(self.stub.close)
+        self.clock = FakeClock()
+        patcher = mock.patch("api.jwks.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = JWKSKeyStore(self.stub.url, timeout=2, default_max_age=3600, min_refetch_interval=30)
+
+    async def test_concurrent_lookups_share_one_fetch(self):
+        self.stub.delay = 0.1
+        keys = await asyncio.gather(*(self.store.get_key("k1") for _ in range(20)))
+        self.assertEqual(keys, [{"kid": "k1", "kty": "RSA"}] * 20)
+        self.assertEqual(self.stub.requests, 1)
+        self.assertEqual(self.store.fetches, 1)
+
+    async def test_keys_live_for_max_age(self):
+        await self.store.get_key("k1")
+        self.clock.now += 119
+        await self.store.get_key("k1")
+        # 119s is past the refresh point (80%), so a background refresh ran
+        await asyncio.sleep(0.2)
+        self.assertEqual(self.stub.requests, 2)
+
+        self.stub.cache_control = "max-age=10"
+        self.clock.now += 121
+        await self.store.get_key("k1")
+        self.assertEqual(self.stub.requests, 3)
+        self.clock.now += 5
+        await self.store.get_key("k1")
+        self.assertEqual(self.stub.requests, 3)
+
+    async def test_default_max_age_without_cache_control(self):
+        self.stub.cache_control = None
+        await self.store.get_key("k1")
+        self.clock.now += 2000
+        await self.store.get_key("k1")
+        self.assertEqual(self.stub.requests, 1)
+
+    async def test_unknown_kid_refetch_is_rate_limited(self):
+        await self.store.get_key("k1")
+        self.stub.keys = [{"kid": "k1", "kty": "RSA"}, {"kid": "k2", "kty": "RSA"}]
+
+        self.clock.now += 10
+        self.assertIsNone(await self.store.get_key("k2"))
+        self.assertIsNone(await self.store.get_key("made-up"))
+        self.assertEqual(self.stub.requests, 1)
+
+        self.clock.now += 30
+        self.assertEqual(await self.store.get_key("k2"), {"kid": "k2", "kty": "RSA"})
+        self.assertEqual(self.stub.requests, 2)
+
+    async def test_stale_keys_served_after_failed_refresh(self):
+        await self.store.get_key("k1")
+        self.stub.status = 500
+        self.clock.now += 500
+        with self.assertLogs("api.jwks", "ERROR"):
+            key = await self.store.get_key("k1")
+        self.assertEqual(key, {"kid": "k1", "kty": "RSA"})
+        self.assertEqual(self.stub.requests, 2)
+        self.assertEqual(self.store.fetches, 1)
+
+    async def test_failing_provider_is_not_retried_on_every_call(self):
+        await self.store.get_key("k1")
+        self.stub.status = 500
+        self.clock.now += 30
+        with self.assertLogs("api.jwks", "ERROR"):
+            self.assertIsNone(await self.store.get_key("k2"))
+        self.clock.now += 10
+        self.assertIsNone(await self.store.get_key("k2"))
+        self.assertIsNone(await self.store.get_key("k3"))
+        self.assertEqual(self.stub.requests, 2)
+
+        # expired keys: one failed refresh, then the stale key without further fetches
+        self.clock.now += 4000
+        with self.assertLogs("api.jwks", "ERROR"):
+            self.assertEqual(await self.store.get_key("k1"), {"kid": "k1", "kty": "RSA"})
+        self.clock.now += 10
+        self.assertEqual(await self.store.get_key("k1"), {"kid": "k1", "kty": "RSA"})
+        self.assertEqual(self.stub.requests, 3)
+
+        self.stub.status = 200
+        self.clock.now += 30
+        self.assertEqual(await self.store.get_key("k1"), {"kid": "k1", "kty": "RSA"})
+        self.assertEqual(self.stub.requests, 4)
+        self.assertEqual(self.store.fetches, 2)
+
+    async def test_failing_first_fetch_backs_off_too(self):
+        self.stub.status = 500
+        with self.assertLogs("api.jwks", "ERROR"):
+            self.assertIsNone(await self.store.get_key("k1"))
+        self.assertIsNone(await self.store.get_key("k1"))
+        self.assertEqual(self.stub.requests, 1)
+
+
+
+class LocalCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("api.cache.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_least_recently_used_goes_first(self):
+        l1 = LocalCache(max_size=2, ttl=60)
+        l1.set("a", 1)
+        l1.set("b", 2)
+        l1.get("a")  # b is now the least recently used
+        l1.set("c", 3)
+        self.assertEqual([l1.get(key) for key in ("a", "b", "c")], [1, None, 3])
+        self.assertEqual(l1.stats()["evictions"], 1)
+
+    def test_entries_expire_after_their_ttl(self):
+        l1 = LocalCache(max_size=10, ttl=60)
+        l1.set("default", 1)
+        l1.set("short", 2, ttl=5)
+        self.clock.now += 5
+        self.assertEqual((l1.get("default"), l1.get("short")), (1, None))
+        self.clock.now += 55
+        self.assertIsNone(l1.get("default"))
+        self.assertEqual(l1.stats()["size"], 0)
+
+    def test_counters(self):
+        l1 = LocalCache(max_size=1, ttl=60)
+        l1.get("a")
+        l1.set("a", "")  # a cached empty value is a hit
+        l1.get("a")
+        l1.set("b", 2)
+        l1.get("a")
+        stats = l1.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"], stats["size"]), (1, 2, 1, 1))
+
+
+class TitleFetcherTests(SimpleTestCase):
+    def setUp(self):
+        self.fetcher = TitleFetcher(max_bytes=65536, connect_timeout=1, read_timeout=1, total_timeout=2,
+                                    per_host_concurrency=2, cache_ttl=60, failure_ttl=60)
+
+    async def test_host_concurrency_stays_bounded(self):
+        inside = peak = 0
+
+        async def hold(start, seconds):
+            nonlocal inside, peak
+            await asyncio.sleep(start)
+            async with self.fetcher._host_slot("example.com"):
+                inside += 1
+                peak = max(peak, inside)
+                await asyncio.sleep(seconds)
+                inside -= 1
+
+        # one slot frees up while the other is still held, then more callers arrive
+        await asyncio.gather(hold(0, 0.3), hold(0, 0.02), *(hold(0.05 + 0.01 * n, 0.1) for n in range(6)))
+        self.assertEqual(peak, 2)
+        self.assertEqual(self.fetcher._hosts, {})
+
+    async def test_malformed_url_is_a_failed_fetch(self):
+        for url in ("http://[::1/", "http://exa mple.com:99999/"):
+            await cache.adelete(f"title:{long_url_digest(url)}")
+            self.assertEqual(await self.fetcher.fetch(url), "")
+
+
+class TitleEnrichmentTests(SimpleTestCase):
+    async def test_malformed_url_fails_alone(self):
+        queue = TitleEnrichmentQueue(max_pending=10)
+        queue.enqueue(1, "http://[::1/")
+        queue.enqueue(2, "ftp://example.com/file")  # not fetched, no title
+        self.assertEqual(await enrich_titles(queue, batch_size=10, interval=0), 0)
+        self.assertEqual(len(queue), 0)
+        self.assertEqual(queue.failed, 2)
+
+
+class SingleFlightTests(TestCase):
+    short_key = "sf1"
+    long_url = "https://example.com/single-flight"
+
+    @classmethod
+    def setUpTestData(cls):
+        user = CustomUser.objects.create(username="single-flight", email="single-flight@example.com")
+        URLMapping.objects.create(short_url=cls.short_key, long_url=cls.long_url, created_by=user)
+
+    def setUp(self):
+        short_key_l1.delete(self.short_key)
+        cache.delete_many([f"short:{self.short_key}", f"lock:short:{self.short_key}"])
+        self.addCleanup(cache.delete_many, [f"short:{self.short_key}", f"lock:short:{self.short_key}"])
+        self.addCleanup(short_key_l1.delete, self.short_key)
+
+    # The async ORM runs its queries on this (the test's) thread, where they are captured
+    def resolve_concurrently(self, n: int, during=None) -> tuple:
+        async def resolve_all():
+            side_task = asyncio.create_task(during()) if during else None
+            results = await asyncio.gather(*(resolve_short_key(self.short_key) for _ in range(n)))
+            if side_task:
+                await side_task
+            return results
+
+        with CaptureQueriesContext(connection) as queries:
+            results = async_to_sync(resolve_all)()
+        return results, len(queries)
+
+    def test_concurrent_misses_query_once(self):
+        results, queries = self.resolve_concurrently(50)
+        self.assertEqual(results, [self.long_url] * 50)
+        self.assertEqual(queries, 1)
+
+    def test_concurrent_misses_query_once_with_cross_worker_lock(self):
+        config = {**settings.SHORT_KEY_SINGLE_FLIGHT, "CROSS_WORKER_LOCK": True}
+        with override_settings(SHORT_KEY_SINGLE_FLIGHT=config):
+            results, queries = self.resolve_concurrently(50)
+        self.assertEqual(results, [self.long_url] * 50)
+        self.assertEqual(queries, 1)
+        self.assertFalse(cache.has_key(f"lock:short:{self.short_key}"))
+
+    def test_waits_for_the_worker_holding_the_lock(self):
+        config = {**settings.SHORT_KEY_SINGLE_FLIGHT, "CROSS_WORKER_LOCK": True, "LOCK_WAIT": 1}
+        # another worker took the lock and fills the cache shortly after
+        cache.set(f"lock:short:{self.short_key}", 1, timeout=2)
+
+        async def other_worker():
+            await asyncio.sleep(0.1)
+            await aset(f"short:{self.short_key}", self.long_url)
+
+        with override_settings(SHORT_KEY_SINGLE_FLIGHT=config):
+            results, queries = self.resolve_concurrently(10, during=other_worker)
+        self.assertEqual(results, [self.long_url] * 10)
+        self.assertEqual(queries, 0)
+
+
+
+class NegativeCacheTests(TestCase):
+    short_key = "nope1"
+
+    def setUp(self):
+        short_key_l1.delete(self.short_key)
+        cache.delete(f"short:{self.short_key}")
+        self.addCleanup(cache.delete, f"short:{self.short_key}")
+        self.addCleanup(short_key_l1.delete, self.short_key)
+
+    def resolve(self) -> tuple:
+        with CaptureQueriesContext(connection) as queries:
+            long_url = async_to_sync(resolve_short_key)(self.short_key)
+        return long_url, len(queries)
+
+    def test_unknown_key_is_cached_as_missing(self):
+        self.assertEqual(self.resolve(), (None, 1))
+        self.assertEqual(cache.get(f"short:{self.short_key}"), MISSING)
+        self.assertLessEqual(cache.ttl(f"short:{self.short_key}"), settings.SHORT_KEY_NEGATIVE_TTL)
+        self.assertEqual(self.resolve(), (None, 0))  # L1
+        short_key_l1.delete(self.short_key)
+        self.assertEqual(self.resolve(), (None, 0))  # Redis
+
+    def test_missing_entry_expires_from_l1(self):
+        self.resolve()
+        cache.delete(f"short:{self.short_key}")
+        with mock.patch("api.cache.time.monotonic", return_value=time.monotonic() + settings.SHORT_KEY_NEGATIVE_TTL + 1):
+            self.assertEqual(self.resolve(), (None, 1))
+
+    def test_bloom_guard_skips_the_database_for_definite_misses(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.001)
+        with mock.patch("api.bloom.short_key_bloom", bloom):
+            self.assertEqual(self.resolve(), (None, 0))
+            self.assertIsNone(cache.get(f"short:{self.short_key}"))  # only L1 remembers it
+
+            short_key_l1.delete(self.short_key)
+            bloom.add(self.short_key)
+            self.assertEqual(self.resolve(), (None, 1))
+
+
+class BloomFilterTests(SimpleTestCase):
+    def test_no_false_negatives_under_concurrent_adds(self):
+        bloom = BloomFilter(capacity=40000, error_rate=0.01)
+        batches = [[f"key-{n}-{i}" for i in range(5000)] for n in range(8)]
+        threads = [threading.Thread(target=lambda keys=keys: [bloom.add(key) for key in keys]) for keys in batches]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(all(key in bloom for keys in batches for key in keys))
+
+
+class SequenceKeyAllocatorTests(TestCase):
+    def test_blocks_are_contiguous_and_disjoint(self):
+        first = SequenceKeyAllocator(block_size=100, name="test-blocks")
+        second = SequenceKeyAllocator(block_size=100, name="test-blocks")
+        self.assertEqual(
+            [first._reserve_block(), second._reserve_block(), first._reserve_block()],
+            [0, 100, 200],
+        )
+        self.assertEqual(ShortKeySequence.objects.get(name="test-blocks").next_value, 300)
+
+
+
+class KeyPoolAllocatorTests(TestCase):
+    def make_allocator(self, **kwargs) -> KeyPoolAllocator:
+        return KeyPoolAllocator(**{"low_water": 10, "refill_size": 20, "claim_batch": 5, **kwargs})
+
+    def test_refill_counts_only_inserted_keys(self):
+        allocator = self.make_allocator()
+        ShortKeyPool.objects.bulk_create([ShortKeyPool(key="aaaaaa"), ShortKeyPool(key="bbbbbb", claimed=True)])
+        user = CustomUser.objects.create(username="keys", email="keys@example.com")
+        URLMapping.objects.create(short_url="cccccc", long_url="https://example.com/c", created_by=user)
+        keys = iter(["aaaaaa", "bbbbbb", "cccccc", "dddddd", "eeeeee"])
+        with mock.patch.object(allocator._generator, "allocate", lambda: next(keys, "eeeeee")):
+            self.assertEqual(allocator.refill(), 2)  # dddddd, eeeeee
+        self.assertEqual(
+            set(ShortKeyPool.objects.values_list("key", flat=True)),
+            {"aaaaaa", "bbbbbb", "dddddd", "eeeeee"},
+        )
+
+    def test_refill_stops_at_low_water(self):
+        allocator = self.make_allocator()
+        self.assertEqual(allocator.refill(), 20)
+        self.assertEqual(allocator.refill(), 0)
+
+    def test_claims_are_disjoint(self):
+        self.make_allocator().refill()
+        first, second = self.make_allocator(), self.make_allocator()
+        keys = [first.allocate() for _ in range(7)] + [second.allocate() for _ in range(7)]
+        self.assertEqual(len(set(keys)), 14)
+        self.assertEqual(ShortKeyPool.objects.filter(claimed=True).count(), 20)  # 4 batches of 5
+        self.assertFalse(ShortKeyPool.objects.filter(key__in=keys, claimed=False).exists())
+
+    def test_empty_pool_is_refilled_inline(self):
+        allocator = self.make_allocator()
+        with self.assertLogs("api.keygen", "WARNING"):
+            key = allocator.allocate()
+        self.assertTrue(ShortKeyPool.objects.get(key=key).claimed)
+
+    def test_pool_that_stays_empty_is_an_error(self):
+        allocator = self.make_allocator(low_water=0)  # refill never adds anything
+        with self.assertLogs("api.keygen", "WARNING"), self.assertRaisesMessage(RuntimeError, "pool is empty"):
+            allocator.allocate()
+
+
+
+class ConcurrentKeyClaimTests(TransactionTestCase):
+    def test_concurrent_claims_are_disjoint(self):
+        skip_concurrent_writes_on_in_memory_sqlite(self)
+        KeyPoolAllocator(low_water=200, refill_size=200).refill()
+        pool = DatabasePool(max_connections=4, idle_timeout=0.1)
+        start = threading.Barrier(4)
+
+        def claim():
+            allocator = KeyPoolAllocator(claim_batch=10)
+            start.wait()
+            return [key for _ in range(5) for key in allocator._claim_batch()]
+
+        async def claim_all():
+            return await asyncio.gather(*(pool.run(claim) for _ in range(4)))
+
+        keys = [key for batch in async_to_sync(claim_all)() for key in batch]
+        self.assertEqual(len(keys), len(set(keys)))
+        self.assertEqual(ShortKeyPool.objects.filter(claimed=True).count(), len(keys))
+
+
+def select_one():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    return connection.connection
+
+
+# The pool's threads open their own connections, to the test database
+class DatabasePoolTests(SimpleTestCase):
+    databases = {"default"}
+
+    def setUp(self):
+        self.pool = DatabasePool(max_connections=2, idle_timeout=0.1)
+        self.created = []
+        receiver = lambda sender, connection, **kwargs: self.created.append(connection.connection)
+        connection_created.connect(receiver, weak=False, dispatch_uid="db_pool_tests")
+        self.addCleanup(connection_created.disconnect, dispatch_uid="db_pool_tests")
+        self.addCleanup(self.wait_until_reaped)
+
+    # Idle threads close their connections, so none outlive the test database
+    def wait_until_reaped(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            return
+        deadline = time.monotonic() + 2
+        while self.pool.stats()["open_connections"] and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(self.pool.stats()["open_connections"], 0)
+
+    # Django never closes an in-memory SQLite connection, so there is nothing to reap or recycle
+    def skip_if_in_memory(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("in-memory SQLite connections are never closed")
+
+    async def test_threads_and_connections_stay_within_max(self):
+        def slow_query():
+            time.sleep(0.02)
+            return threading.get_ident(), select_one()
+
+        results = await asyncio.gather(*(self.pool.run(slow_query) for _ in range(20)))
+        self.assertLessEqual(len({ident for ident, _ in results}), 2)
+        self.assertLessEqual(len({id(conn) for _, conn in results}), 2)
+        self.assertLessEqual(len(self.created), 2)
+        stats = self.pool.stats()
+        self.assertEqual(stats["threads"], 2)
+        self.assertLessEqual(stats["open_connections"], 2)
+
+    async def test_idle_connections_are_reaped(self):
+        self.skip_if_in_memory()
+        await self.pool.run(select_one)
+        self.assertEqual(self.pool.stats()["open_connections"], 1)
+        await asyncio.sleep(0.3)
+        self.assertEqual(self.pool.stats()["open_connections"], 0)
+        self.assertEqual(self.pool.stats()["reaped"], 1)
+        # the thread stays and connects again when work comes back
+        await self.pool.run(select_one)
+        self.assertEqual(len(self.created), 2)
+        self.assertEqual(self.pool.stats()["threads"], 1)
+
+    async def test_connection_past_max_age_is_recycled(self):
+        self.skip_if_in_memory()
+        self.pool = DatabasePool(max_connections=1, idle_timeout=0.1)  # one thread, one connection
+        first = await self.pool.run(select_one)
+        self.assertIs(await self.pool.run(select_one), first)
+
+        def expire():
+            connection.close_at = time.monotonic() - 1  # what CONN_MAX_AGE sets
+            return select_one()
+
+        await self.pool.run(expire)
+        self.assertIsNot(await self.pool.run(select_one), first)
+        self.assertEqual(len(self.created), 2)
+        self.assertEqual(self.pool.stats()["recycled"], 1)
+
+    async def test_broken_connection_is_replaced(self):
+        self.skip_if_in_memory()
+        self.pool = DatabasePool(max_connections=1, idle_timeout=0.1)  # one thread, one connection
+        unusable = mock.patch.object(type(connections["default"]), "is_usable", return_value=False)
+
+        # CONN_HEALTH_CHECKS: a reused connection is pinged before its first query
+        first = await self.pool.run(select_one)
+        if connection.settings_dict["CONN_HEALTH_CHECKS"]:
+            with unusable:
+                self.assertIsNot(await self.pool.run(select_one), first)
+            self.assertEqual(len(self.created), 2)
+
+        # a job that hit a database error leaves a connection that is checked and dropped
+        def fail():
+            select_one()
+            connection.errors_occurred = True
+
+        with unusable:
+            await self.pool.run(fail)
+        self.assertEqual(self.pool.stats()["recycled"], 1)
+        self.assertEqual(self.pool.stats()["open_connections"], 0)
+        created = len(self.created)
+        await self.pool.run(select_one)
+        self.assertEqual(len(self.created), created + 1)
+
+    async def test_jobs_run_in_the_callers_context(self):
+        request_id = contextvars.ContextVar("request_id", default=None)
+        request_id.set("r1")
+        self.assertEqual(await self.pool.run(request_id.get), "r1")
+
+        install_query_timer()
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        try:
+            await self.pool.run(select_one)
+            await self.pool.run(select_one)
+        finally:
+            _request_stats.reset(token)
+        self.assertEqual(stats.queries, 2)
+
+
+class WriteProfileTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+
+    def write(self, name: str, stack: str, max_bytes: int):
+        write_profile(self.directory, name, Counter({stack: 1}), [], "", max_bytes)
+
+    def set_mtime(self, name: str, mtime: float):
+        for suffix in (".folded", ".sql.txt"):
+            os.utime(os.path.join(self.directory, name + suffix), (mtime, mtime))
+
+    def test_oldest_profile_goes_first_and_other_files_stay(self):
+        with open(os.path.join(self.directory, "notes.txt"), "w") as f:
+            f.write("x" * 1000)
+        self.write("old", "a" * 40, max_bytes=200)
+        self.set_mtime("old", 1000)
+        self.write("mid", "b" * 40, max_bytes=200)
+        self.set_mtime("mid", 2000)
+        self.write("new", "c" * 40, max_bytes=100)
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            ["mid.folded", "mid.sql.txt", "new.folded", "new.sql.txt", "notes.txt"],
+        )
+
+    def test_oversized_profile_deletes_nothing(self):
+        self.write("kept", "a", max_bytes=100)
+        self.write("huge", "é" * 60, max_bytes=100)  # 60 characters, 120 bytes
+        self.assertEqual(sorted(os.listdir(self.directory)), ["kept.folded", "kept.sql.txt"])
+
+
+async def asgi_request(app, method: str, path: str, **kwargs) -> httpx.Response:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        return await client.request(method, path, **kwargs)
+
+
+# The endpoints load users through db_pool's threads, which only see committed rows
+class AuthTokenTests(TransactionTestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username="tokens", email="tokens@example.com")
+        cache.delete(principal_cache_key(self.user.username))
+        self.addCleanup(cache.delete, principal_cache_key(self.user.username))
+        self.access = create_access_token(token_claims(self.user))
+        self.refresh = create_access_token(token_claims(self.user, "refresh"))
+
+    def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        return async_to_sync(asgi_request)(auth_app, method, path, **kwargs)
+
+    def me(self, token: str) -> httpx.Response:
+        return self.request("GET", "/users/me/", headers={"Authorization": f"Bearer {token}"})
+
+    def test_refresh_token_mints_an_access_token(self):
+        response = self.request("POST", "/refresh", json={"refresh_token": self.refresh})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(decode_access_token(response.json()["access_token"])["typ"], "access")
+
+    def test_access_token_cannot_refresh(self):
+        response = self.request("POST", "/refresh", json={"refresh_token": self.access})
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_token_is_not_a_bearer_token(self):
+        self.assertEqual(self.me(self.access).status_code, 200)
+        self.assertEqual(self.me(self.refresh).status_code, 401)
+        config = {**settings.AUTH_PRINCIPAL, "TRUST_TOKEN_CLAIMS": True}
+        with override_settings(AUTH_PRINCIPAL=config):
+            self.assertEqual(self.me(self.refresh).status_code, 401)
+
+    def test_saving_the_user_drops_the_cached_principal(self):
+        self.assertEqual(self.me(self.access).status_code, 200)
+        self.assertIsNotNone(cache.get(principal_cache_key(self.user.username)))
+
+        self.user.disabled = True
+        self.user.save()
+        self.assertEqual(self.me(self.access).status_code, 400)
+
+        self.user.delete()
+        self.assertEqual(self.me(self.access).status_code, 401)
+
+
+def make_principal(username: str) -> Principal:
+    user = CustomUser.objects.create(username=username, email=f"{username}@example.com")
+    return Principal(id=user.id, username=user.username, disabled=False)
+
+
+class EncodeTests(TestCase):
+    def setUp(self):
+        self.shortener = Shortener()
+        self.alice = make_principal("alice")
+        self.bob = make_principal("bob")
+
+    def titles(self, long_url: str) -> dict:
+        return dict(
+            UserURLMapping.objects.filter(url_mapping__long_url=long_url).values_list('user__username', 'title')
+        )
+
+    def test_second_user_gets_the_existing_short_url(self):
+        url = "https://example.com/shared"
+        first = self.shortener.encode(url, "Alice's", self.alice)
+        second = self.shortener.encode(url, "Bob's", self.bob)
+        self.assertEqual(first, second)
+        self.assertEqual(URLMapping.objects.filter(long_url_digest=long_url_digest(url)).count(), 1)
+        self.assertEqual(self.titles(url), {"alice": "Alice's", "bob": "Bob's"})
+
+    def test_new_and_known_urls_take_two_statements(self):
+        self.shortener.encode("https://example.com/warm-up", "t", self.alice)  # reserves a key block
+        for url in ("https://example.com/new", "https://example.com/new"):
+            with CaptureQueriesContext(connection) as queries:
+                self.shortener.encode(url, "t", self.bob)
+            statements = [q["sql"] for q in queries if not q["sql"].startswith(("SAVEPOINT", "RELEASE SAVEPOINT"))]
+            self.assertEqual(len(statements), 2, statements)  # mapping upsert, link upsert
+        self.assertEqual(URLMapping.objects.filter(long_url="https://example.com/new").count(), 1)
+
+
+
+class EncodeBatchTests(TestCase):
+    def setUp(self):
+        self.shortener = Shortener()
+        self.alice = make_principal("alice")
+
+    def test_duplicates_take_the_last_title(self):
+        url = "https://example.com/dup"
+        results = self.shortener.encode_many([(url, "first"), ("https://example.com/other", "x"), (url, "last")],
+                                             self.alice)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(UserURLMapping.objects.get(url_mapping__long_url=url).title, "last")
+        self.assertEqual(URLMapping.objects.filter(long_url=url).count(), 1)
+
+    def test_known_urls_keep_their_short_url(self):
+        known = "https://example.com/known"
+        existing = self.shortener.encode(known, "old", make_principal("bob"))["real_url"]
+        new = "https://example.com/new"
+        results = self.shortener.encode_many([(known, "mine"), (new, "also mine")], self.alice)
+        self.assertEqual(results[known]["real_url"], existing)
+        self.assertNotEqual(results[new]["real_url"], existing)
+        self.assertEqual(URLMapping.objects.filter(long_url__in=[known, new]).count(), 2)
+        self.assertEqual(
+            dict(UserURLMapping.objects.filter(user_id=self.alice.id).values_list("url_mapping__long_url", "title")),
+            {known: "mine", new: "also mine"},
+        )
+
+    def test_too_many_items_is_a_413(self):
+        api_app.dependency_overrides[get_current_active_user] = lambda: self.alice
+        self.addCleanup(api_app.dependency_overrides.pop, get_current_active_user)
+        items = [{"url": f"https://example.com/{n}"} for n in range(3)]
+        with override_settings(ENCODE_BATCH={**settings.ENCODE_BATCH, "MAX_ITEMS": 2}):
+            response = async_to_sync(asgi_request)(api_app, "POST", "/encode/batch", json={"items": items})
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(URLMapping.objects.exists())
+
+
+# Both encodes run on db_pool threads, each in its own transaction
+class ConcurrentEncodeTests(TransactionTestCase):
+    def test_concurrent_encodes_of_one_url_make_one_mapping(self):
+        skip_concurrent_writes_on_in_memory_sqlite(self)
+        shortener = Shortener()
+        pool = DatabasePool(max_connections=2, idle_timeout=0.1)
+        users = [make_principal("alice"), make_principal("bob")]
+        url = "https://example.com/race"
+        start = threading.Barrier(2)
+
+        def encode(user):
+            start.wait()
+            return shortener.encode(url, user.username, user)
+
+        async def encode_both():
+            return await asyncio.gather(*(pool.run(encode, user) for user in users))
+
+        first, second = async_to_sync(encode_both)()
+        self.assertEqual(first, second)
+        self.assertEqual(URLMapping.objects.filter(long_url=url).count(), 1)
+        self.assertEqual(UserURLMapping.objects.filter(url_mapping__long_url=url).count(), 2)
+
+
+class PasswordHashPoolTests(SimpleTestCase):
+    async def test_rejects_work_past_max_pending(self):
+        pool = PasswordHashPool(workers=1, max_pending=2)
+        release = threading.Event()
+        held = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+
+        with self.assertRaises(PasswordHashPoolFull):
+            await pool.run(lambda: "hash")
+        self.assertEqual(pool.stats()["rejected"], 1)
+
+        # a caller that stops waiting doesn't free its slot while its job still runs
+        held[0].cancel()
+        await asyncio.sleep(0.05)
+        with self.assertRaises(PasswordHashPoolFull):
+            await pool.run(lambda: "hash")
+        self.assertEqual(pool.stats()["pending"], 2)
+
+        release.set()
+        await held[1]
+        await asyncio.sleep(0.05)
+        self.assertEqual(await pool.run(lambda: "hash"), "hash")
+        stats = pool.stats()
+        self.assertEqual((stats["pending"], stats["completed"], stats["rejected"]), (0, 3, 2))
+
+
+class OAuthCallbackTests(SimpleTestCase):
+    databases = {"default"}
+
+    def test_busy_hash_pool_is_a_503(self):
+        google = mock.Mock()
+        google.authorize_access_token = mock.AsyncMock(return_value={"id_token": "id-token"})
+        with mock.patch("api.auth_endpoints.get_oauth", return_value=mock.Mock(google=google)), \
+                mock.patch("api.auth_endpoints.jwt.get_unverified_header", return_value={"kid": "k1"}), \
+                mock.patch("api.auth_endpoints.google_jwks.get_key", mock.AsyncMock(return_value={"kid": "k1"})), \
+                mock.patch("api.auth_endpoints.jwt.decode", return_value={"email": "new@example.com"}), \
+                mock.patch("api.auth_endpoints.aget_password_hash", mock.AsyncMock(side_effect=PasswordHashPoolFull)):
+            response = async_to_sync(asgi_request)(auth_app, "GET", "/callback")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+
+
+# Answers with the status named by the path ("/404" -> 404) and an empty body; "/boom" raises
+async def status_app(scope, receive, send):
+    if scope["path"] == "/boom":
+        raise RuntimeError("boom")
+    await send({"type": "http.response.start", "status": int(scope["path"].strip("/") or 200), "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def http_scope(path: str, query: bytes = b"", method: str = "GET") -> dict:
+    return {"type": "http", "method": method, "path": path, "query_string": query, "headers": []}
+
+
+async def noop_receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def noop_send(message):
+    pass
+
+
+class TrafficRecorderTests(SimpleTestCase):
+    def make_recorder(self, sample_rate: float = 1.0, max_size: int = 100) -> TrafficRecorder:
+        self.buffer = TraceBuffer(max_size=max_size)
+        return TrafficRecorder(status_app, sample_rate, ["limit", "days"], buffer=self.buffer)
+
+    def traces(self) -> list:
+        return [json.loads(line) for line in self.buffer.drain()]
+
+    async def test_only_sampled_requests_are_recorded(self):
+        recorder = self.make_recorder(sample_rate=0.5)
+        with mock.patch("api.traffic.random.random", side_effect=[0.2, 0.7, 0.49, 0.5]):
+            for path in ("/200", "/201", "/202", "/203"):
+                await recorder(http_scope(path), noop_receive, noop_send)
+        self.assertEqual([trace["path"] for trace in self.traces()], ["/200", "/202"])
+
+        recorder = self.make_recorder(sample_rate=0)
+        await recorder(http_scope("/200"), noop_receive, noop_send)
+        self.assertEqual(self.traces(), [])
+
+    async def test_only_allowlisted_query_parameters_are_kept(self):
+        recorder = self.make_recorder()
+        await recorder(http_scope("/200", b"limit=5&cursor=secret&code=abc&days=2"), noop_receive, noop_send)
+        (trace,) = self.traces()
+        self.assertEqual(trace["query"], "limit=5&days=2")
+        self.assertEqual(set(trace), {"ts", "method", "path", "query", "status", "duration_ms"})
+
+    async def test_status_is_recorded_even_when_the_app_raises(self):
+        recorder = self.make_recorder()
+        await recorder(http_scope("/404"), noop_receive, noop_send)
+        with self.assertRaises(RuntimeError):
+            await recorder(http_scope("/boom"), noop_receive, noop_send)
+        self.assertEqual([trace["status"] for trace in self.traces()], [404, 500])
+
+    async def test_full_buffer_drops_and_counts(self):
+        recorder = self.make_recorder(max_size=2)
+        for _ in range(3):
+            await recorder(http_scope("/200"), noop_receive, noop_send)
+        self.assertEqual((self.buffer.stats()["recorded"], self.buffer.stats()["dropped"]), (2, 1))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "traffic.jsonl")
+            await flush_traces(self.buffer, path)
+            with open(path) as f:
+                self.assertEqual(len(f.readlines()), 2)
+        self.assertEqual(len(self.buffer), 0)
+
+
+class ReplayTests(SimpleTestCase):
+    def setUp(self):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(int(self.path.split("?")[0].strip("/")))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.base_url = f"http://127.0.0.1:{server.server_port}"
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "traffic.jsonl")
+        traces = [
+            {"ts": 2.0, "method": "GET", "path": "/404", "query": "", "status": 404, "duration_ms": 1},
+            {"ts": 1.0, "method": "GET", "path": "/200", "query": "limit=5", "status": 200, "duration_ms": 1},
+            {"ts": 1.5, "method": "POST", "path": "/201", "query": "", "status": 201, "duration_ms": 1},
+            {"ts": 3.0, "method": "GET", "path": "/200", "query": "", "status": 302, "duration_ms": 1},
+        ]
+        with open(self.path, "w") as f:
+            f.write("".join(json.dumps(trace) + "\n" for trace in traces) + "\n")
+
+    def test_load_trace_keeps_replayable_methods_in_order(self):
+        traces = load_trace(self.path, {"GET", "HEAD"})
+        self.assertEqual([trace["ts"] for trace in traces], [1.0, 2.0, 3.0])
+
+    async def test_replay_compares_statuses_with_the_recording(self):
+        traces = load_trace(self.path, {"GET"})
+        result = await replay(traces, self.base_url, speed=0, max_in_flight=2, timeout=5)
+        self.assertEqual(result["requests"], 3)
+        self.assertEqual(result["statuses"], {200: 2, 404: 1})
+        self.assertEqual(result["status_mismatches"], 1)
+        self.assertEqual(result["recorded_span"], 2.0)
+
+
+class ClickRollupTests(TestCase):
+    now = datetime(2026, 3, 10, 12, 30, tzinfo=dt_timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username="rollups", email="rollups@example.com")
+        cls.first = URLMapping.objects.create(short_url="roll1", long_url="https://example.com/1", created_by=cls.user)
+        cls.second = URLMapping.objects.create(short_url="roll2", long_url="https://example.com/2", created_by=cls.user)
+        for mapping in (cls.first, cls.second):
+            UserURLMapping.objects.create(user=cls.user, url_mapping=mapping)
+
+    def click(self, short_key: str, minutes_ago: int, n: int = 1):
+        ClickEvent.objects.bulk_create(
+            [ClickEvent(short_url=short_key, clicked_at=self.now - timedelta(minutes=minutes_ago)) for _ in range(n)]
+        )
+
+    def stats(self, stats_query, *args, **kwargs) -> dict:
+        with mock.patch("api.rollups.timezone.now", return_value=self.now):
+            return async_to_sync(stats_query)(*args, **kwargs)
+
+    def test_clicks_are_folded_exactly_once(self):
+        self.click("roll1", 10, n=2)     # 12:00 hour
+        self.click("roll1", 40)          # 11:00 hour
+        self.click("roll2", 24 * 60)     # the day before
+        self.click("gone", 5)            # link deleted since; skipped
+        # create the watermark, see the newest id, fold up to it, catch up
+        self.assertEqual([aggregate_clicks() for _ in range(4)], [0, 0, 5, 0])
+
+        self.click("roll1", 1, n=3)
+        self.assertEqual([aggregate_clicks() for _ in range(4)], [0, 3, 0, 0])
+        self.assertEqual(ClickRollupDaily.objects.aggregate(total=Sum("clicks"))["total"], 7)
+
+        hour = self.now.replace(minute=0)
+        self.assertEqual(
+            set(ClickRollupHourly.objects.values_list("url_mapping__short_url", "bucket", "clicks")),
+            {("roll1", hour, 5), ("roll1", hour - timedelta(hours=1), 1), ("roll2", hour - timedelta(hours=24), 1)},
+        )
+        self.assertEqual(
+            set(ClickRollupDaily.objects.values_list("url_mapping__short_url", "bucket", "clicks")),
+            {("roll1", date(2026, 3, 10), 6), ("roll2", date(2026, 3, 9), 1)},
+        )
+
+    def test_stats_read_the_rollups(self):
+        self.click("roll1", 10, n=2)
+        self.click("roll1", 40)
+        self.click("roll2", 24 * 60)
+        for _ in range(3):
+            aggregate_clicks()
+
+        stats = self.stats(link_stats, self.first.id, hours=2, days=2)
+        self.assertEqual(stats["total_clicks"], 3)
+        self.assertEqual([row["clicks"] for row in stats["hourly"]], [1, 2])
+        self.assertEqual(stats["daily"], [{"day": "2026-03-10", "clicks": 3}])
+
+        stats = self.stats(user_stats, self.user.id, days=1, top=10)
+        self.assertEqual((stats["total_clicks"], stats["recent_clicks"]), (4, 3))
+        self.assertEqual(stats["top_links"], [{"short_url": "roll1", "clicks": 3}])
+
+
+# GET /api/links as a given user, without going through token auth
+class LinksTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username="links", email="links@example.com")
+        cls.mappings = [
+            URLMapping.objects.create(short_url=f"lnk{n}", long_url=f"https://example.com/{n}", created_by=cls.user)
+            for n in range(5)
+        ]
+        for n, mapping in enumerate(cls.mappings):
+            UserURLMapping.objects.create(user=cls.user, url_mapping=mapping, title=f"Link {n}")
+        # one timestamp for every link: only the id tiebreak keeps pages apart
+        UserURLMapping.objects.filter(user=cls.user).update(created_at=datetime(2026, 1, 1, tzinfo=dt_timezone.utc))
+
+    def setUp(self):
+        principal = Principal(id=self.user.id, username=self.user.username, disabled=False)
+        api_app.dependency_overrides[get_current_active_user] = lambda: principal
+        self.addCleanup(api_app.dependency_overrides.pop, get_current_active_user)
+
+    def get(self, path: str) -> httpx.Response:
+        return async_to_sync(asgi_request)(api_app, "GET", path)
+
+    def test_cursor_round_trip(self):
+        created_at = datetime(2026, 1, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc)
+        self.assertEqual(decode_cursor(encode_cursor(created_at, 42)), (created_at, 42))
+
+    def test_tampered_cursor_is_a_400(self):
+        for cursor in ("not-base64!", encode_cursor(datetime(2026, 1, 1), 1)[:-4], "WyJ4Il0="):  # '["x"]'
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(cursor)
+            self.assertEqual(self.get(f"/links?limit=2&cursor={cursor}").status_code, 400)
+
+    def test_pages_are_stable_when_created_at_ties(self):
+        seen, cursor = [], None
+        while True:
+            page = self.get("/links?limit=2" + (f"&cursor={cursor}" if cursor else "")).json()
+            seen += [item["short_url"] for item in page["items"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, ["lnk4", "lnk3", "lnk2", "lnk1", "lnk0"])
+
+    def test_streamed_list_matches_the_old_response(self):
+        # what `response_model=List[URLMappingSchema]` used to produce
+        expected = [
+            URLMappingSchema(
+                long_url=mapping.long_url, short_url=mapping.short_url, title=f"Link {n}",
+                created_at=mapping.created_at, created_by=self.user.username,
+            ).model_dump(mode="json")
+            for n, mapping in enumerate(self.mappings)
+        ]
+        config = {**settings.LINKS_PAGE, "STREAM_CHUNK_SIZE": 2}
+        with override_settings(LINKS_PAGE=config):
+            response = self.get("/links")
+        self.assertEqual(response.headers["content-type"], "application/json")
+        self.assertEqual(response.json(), expected[::-1])
+
+
+class ClickBufferTests(SimpleTestCase):
+    def test_full_buffer_drops_and_counts(self):
+        buffer = ClickBuffer(max_size=2)
+        for _ in range(3):
+            buffer.record("k1", "", "")
+        self.assertEqual(len(buffer), 2)
+        self.assertEqual((buffer.stats()["recorded"], buffer.stats()["dropped"]), (2, 1))
+
+    def test_disabled_buffer_records_nothing(self):
+        buffer = ClickBuffer(max_size=2, enabled=False)
+        buffer.record("k1", "", "")
+        self.assertEqual((len(buffer), buffer.stats()["dropped"]), (0, 0))
+
+
+# flush_clicks writes from db_pool's threads
+class ClickFlushTests(TransactionTestCase):
+    def test_flush_writes_the_buffered_clicks(self):
+        buffer = ClickBuffer(max_size=10)
+        buffer.record("k1", "https://ref.example/" + "x" * 300, "Mozilla/5.0")
+        buffer.record("k2", "", "")
+        async_to_sync(flush_clicks)(buffer, batch_size=1)
+
+        self.assertEqual((len(buffer), buffer.stats()["flushed"]), (0, 2))
+        first, second = ClickEvent.objects.order_by("id")
+        self.assertEqual((first.short_url, len(first.referrer), len(first.ua_hash)), ("k1", 255, 16))
+        self.assertEqual((second.short_url, second.referrer, second.ua_hash), ("k2", "", ""))
+        self.assertLess(abs(time.time() - first.clicked_at.timestamp()), 60)
+
+    def test_failed_write_is_counted(self):
+        buffer = ClickBuffer(max_size=10)
+        buffer.record("k1", "", "")
+        with mock.patch("api.clicks.write_clicks", side_effect=RuntimeError("down")), \
+                self.assertLogs("api.clicks", "ERROR"):
+            async_to_sync(flush_clicks)(buffer, batch_size=10)
+        self.assertEqual((len(buffer), buffer.stats()["failed"]), (0, 1))
+        self.assertFalse(ClickEvent.objects.exists())
+
+
+class RedirectFastLaneTests(TestCase):
+    long_url = "https://example.com/fast?q=café au lait"
+
+    @classmethod
+    def setUpTestData(cls):
+        user = CustomUser.objects.create(username="fast-lane", email="fast-lane@example.com")
+        URLMapping.objects.create(short_url="fast1", long_url=cls.long_url, created_by=user)
+
+    def setUp(self):
+        for short_key in ("fast1", "nokey1"):
+            short_key_l1.delete(short_key)
+            cache.delete(f"short:{short_key}")
+            self.addCleanup(cache.delete, f"short:{short_key}")
+            self.addCleanup(short_key_l1.delete, short_key)
+
+        self.full_app = FastAPI()
+        self.full_app.mount("/api", api_app)
+        self.passed = []
+
+        async def passed_through(scope, receive, send):
+            self.passed.append(scope["path"])
+            await self.full_app(scope, receive, send)
+
+        self.fast_app = RedirectFastLane(passed_through, prefix="/api", inner_app=api_app, endpoint=redirect_url)
+
+    def both(self, path: str, **kwargs) -> tuple:
+        full = async_to_sync(asgi_request)(self.full_app, "GET", path, **kwargs)
+        fast = async_to_sync(asgi_request)(self.fast_app, "GET", path, **kwargs)
+        return full, fast
+
+    def test_answers_like_redirect_url(self):
+        for path, status in (("/api/fast1", 307), ("/api/nokey1", 404)):
+            full, fast = self.both(path)
+            self.assertEqual((fast.status_code, fast.headers.get("location"), fast.content),
+                             (full.status_code, full.headers.get("location"), full.content))
+            self.assertEqual(fast.status_code, status)
+            self.assertEqual(fast.headers["content-length"], full.headers["content-length"])
+        self.assertEqual(self.passed, [])
+
+    def test_falls_through_for_reserved_names_and_cors(self):
+        for path in ("/api/test", "/api/links", "/api/docs", "/api/fast1/"):
+            full, fast = self.both(path)
+            self.assertEqual((fast.status_code, fast.content), (full.status_code, full.content))
+        self.both("/api/fast1", headers={"origin": "https://ui.example"})
+        async_to_sync(asgi_request)(self.fast_app, "HEAD", "/api/fast1")
+        self.assertEqual(self.passed, ["/api/test", "/api/links", "/api/docs", "/api/fast1/", "/api/fast1", "/api/fast1"])
+
+
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        short_key_l1.delete("nokey2")
+        cache.delete("short:nokey2")
+        self.addCleanup(cache.delete, "short:nokey2")
+        self.addCleanup(short_key_l1.delete, "nokey2")
+        outer = FastAPI()
+        outer.mount("/api", api_app)
+        self.app = MetricsMiddleware(outer, root_app=outer)
+
+    def requests(self, route: str, status: int) -> int:
+        return http_requests._values.get((route, "GET", status), 0)
+
+    def get(self, path: str) -> httpx.Response:
+        # the test connection predates install_query_timer(), so time its queries explicitly
+        with connection.execute_wrapper(_time_query):
+            return async_to_sync(asgi_request)(self.app, "GET", path)
+
+    def test_routes_are_labelled_with_their_template(self):
+        before = [self.requests("/api/test", 200), self.requests("/api/{short_key}", 404),
+                  self.requests("unmatched", 404)]
+        self.assertEqual(self.get("/api/test").status_code, 200)
+        self.assertEqual(self.get("/api/nokey2").status_code, 404)
+        self.assertEqual(self.get("/nowhere").status_code, 404)
+        after = [self.requests("/api/test", 200), self.requests("/api/{short_key}", 404),
+                 self.requests("unmatched", 404)]
+        self.assertEqual([b - a for a, b in zip(before, after)], [1, 1, 1])
+
+    def test_queries_are_counted_against_their_route(self):
+        before = db_queries._values.get(("/api/{short_key}",), 0)
+        background = db_queries._values.get(("background",), 0)
+        self.get("/api/nokey2")  # one lookup, then cached as missing
+        self.get("/api/nokey2")
+        self.assertEqual(db_queries._values.get(("/api/{short_key}",), 0) - before, 1)
+        self.assertEqual(db_queries._values.get(("background",), 0), background)
+
+
+class CacheWarmupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = CustomUser.objects.create(username="warmup", email="warmup@example.com")
+        cls.mappings = {
+            n: URLMapping.objects.create(short_url=f"warm{n}", long_url=f"https://example.com/{n}", created_by=user)
+            for n in range(1, 6)
+        }
+        today = timezone.now().date()
+        for n, clicks, days_ago in ((1, 10, 1), (2, 50, 0), (3, 100, 30)):
+            ClickRollupDaily.objects.create(url_mapping=cls.mappings[n], bucket=today - timedelta(days=days_ago),
+                                            clicks=clicks)
+
+    def setUp(self):
+        keys = [f"short:warm{n}" for n in range(1, 6)] + [SENTINEL_KEY]
+        cache.delete_many(keys)
+        self.addCleanup(cache.delete_many, keys)
+        for n in range(1, 6):
+            short_key_l1.delete(f"warm{n}")
+            self.addCleanup(short_key_l1.delete, f"warm{n}")
+
+    def test_most_clicked_first_then_newest(self):
+        # warm3's clicks are older than `days`; warm5 and warm4 are the newest links
+        self.assertEqual(list(hot_short_keys(limit=3, days=7)), ["warm2", "warm1", "warm5"])
+        self.assertEqual(list(hot_short_keys(limit=5, days=7)), ["warm2", "warm1", "warm5", "warm4", "warm3"])
+        self.assertEqual(list(hot_short_keys(limit=1, days=60)), ["warm3"])
+
+    def test_warm_up_fills_redis_and_l1(self):
+        progress = []
+        self.assertEqual(warm_short_keys(limit=3, days=7, chunk_size=2, progress=lambda *p: progress.append(p)), 3)
+        self.assertEqual(progress, [(2, 3), (3, 3)])
+        self.assertEqual(cache.get("short:warm1"), "https://example.com/1")
+        self.assertEqual(short_key_l1.get("warm5"), "https://example.com/5")
+        self.assertIsNone(cache.get("short:warm4"))
+        self.assertIsNotNone(cache.get(SENTINEL_KEY))
+
+
+class CacheWarmupLoopTests(SimpleTestCase):
+    async def test_warms_again_when_the_sentinel_is_gone(self):
+        runs = []
+
+        def warm(*args):
+            runs.append(args)
+            cache.set(SENTINEL_KEY, "now", timeout=None)
+            return 0
+
+        self.addCleanup(cache.delete, SENTINEL_KEY)
+        with override_settings(CACHE_WARMUP={**settings.CACHE_WARMUP, "CHECK_INTERVAL": 0.02}), \
+                mock.patch("api.warmup.warm_short_keys", warm):
+            task = asyncio.create_task(run_cache_warmup())
+            await asyncio.sleep(0.1)
+            self.assertEqual(len(runs), 1)  # at startup only, the sentinel is there
+            await cache.adelete(SENTINEL_KEY)  # Redis was flushed
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self.assertEqual(len(runs), 2)
@@ -0,0 +1,127 @@
+import asyncio
+import html
+import logging
+import re
+import weakref
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+from .cache import aget, aset
+from .metrics import record_cache
+from .models import long_url_digest
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+NO_TITLE = "No title found"
+TITLE_RE = re.compile(rb"<title[^>]*>(.*?)</title\s*>", re.IGNORECASE | re.DOTALL)
+HEAD_END_RE = re.compile(rb"</head\s*>", re.IGNORECASE)
+META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+
+# ✅Fetch just enough of a page to read its <title>.
+# The body is streamed and parsing stops at </title>, </head> or MAX_BYTES.
+# Connect/read/total timeouts bound every fetch, concurrency is limited per host,
+# and results (failures too, for less time) are cached in Redis by URL.
+class TitleFetcher:
+    def __init__(self, max_bytes: int, connect_timeout: float, read_timeout: float, total_timeout: float,
+                 per_host_concurrency: int, cache_ttl: int, failure_ttl: int):
+        self.max_bytes = max_bytes
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+        self.per_host_concurrency = per_host_concurrency
+        self.cache_ttl = cache_ttl
+        self.failure_ttl = failure_ttl
+        self._hosts = {}
+        # one client per event loop, like the async Redis client
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _client(self) -> "httpx.AsyncClient":
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            timeout = httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+            client = self._clients[loop] = httpx.AsyncClient(timeout=timeout, follow_redirects=True)
+        return client
+
+    # The host's semaphore is shared by everyone holding or waiting for a slot and
+    # dropped with the last of them, so idle hosts don't pile up
+    @asynccontextmanager
+    async def _host_slot(self, host: str):
+        entry = self._hosts.get(host)
+        if entry is None:
+            entry = self._hosts[host] = [asyncio.Semaphore(self.per_host_concurrency), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._hosts[host]
+
+    async def fetch(self, url: str) -> str:
+        cache_key = f"title:{long_url_digest(url)}"
+        cached = await aget(cache_key)
+        record_cache("redis", "title", cached is not None)
+        if cached is not None:
+            return cached
+
+        # ❗️httpx is imported on the first fetch, not when the workers start
+        import httpx
+
+        title = ""
+        try:
+            # ❗️urlsplit raises ValueError on malformed input such as "http://[::1/"
+            parts = urlsplit(url)
+            if parts.scheme in ("http", "https") and parts.hostname:
+                async with self._host_slot(parts.hostname):
+                    title = await asyncio.wait_for(self._read_title(url), self.total_timeout)
+        except (httpx.HTTPError, httpx.InvalidURL, ValueError, asyncio.TimeoutError) as e:
+            logger.info("Title fetch for %s failed: %r", url, e)
+        await aset(cache_key, title, timeout=self.cache_ttl if title else self.failure_ttl)
+        return title
+
+    async def _read_title(self, url: str) -> str:
+        buffer = b""
+        async with self._client().stream("GET", url) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                buffer += chunk
+                match = TITLE_RE.search(buffer)
+                if match:
+                    return self._decode(match.group(1), buffer, response) or NO_TITLE
+                if HEAD_END_RE.search(buffer) or len(buffer) >= self.max_bytes:
+                    break
+        return NO_TITLE
+
+    @staticmethod
+    def _decode(raw: bytes, buffer: bytes, response: "httpx.Response") -> str:
+        charset = response.charset_encoding
+        if charset is None:
+            meta = META_CHARSET_RE.search(buffer)
+            charset = meta.group(1).decode("ascii") if meta else "utf-8"
+        try:
+            text = raw.decode(charset, errors="replace")
+        except LookupError:
+            text = raw.decode("utf-8", errors="replace")
+        return " ".join(html.unescape(text).split())
+
+
+title_fetcher = TitleFetcher(
+    max_bytes=settings.TITLE_FETCHER["MAX_BYTES"],
+    connect_timeout=settings.TITLE_FETCHER["CONNECT_TIMEOUT"],
+    read_timeout=settings.TITLE_FETCHER["READ_TIMEOUT"],
+    total_timeout=settings.TITLE_FETCHER["TOTAL_TIMEOUT"],
+    per_host_concurrency=settings.TITLE_FETCHER["PER_HOST_CONCURRENCY"],
+    cache_ttl=settings.TITLE_FETCHER["CACHE_TTL"],
+    failure_ttl=settings.TITLE_FETCHER["FAILURE_TTL"],
+)
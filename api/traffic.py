@@ -0,0 +1,95 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from urllib.parse import parse_qsl, urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .background import BackgroundTask, BoundedBuffer
+from .middleware import StatusRecorder
+
+logger = logging.getLogger(__name__)
+
+
+# ✅Sampled, sanitized request traces for `benchmarks.replay`.
+# One JSON object per line: ts, method, path, query, status, duration_ms.
+# Headers and bodies are never recorded, and only query parameters in
+# QUERY_ALLOWLIST are kept (cursors, OAuth codes and the like are dropped).
+class TraceBuffer(BoundedBuffer):
+    def record(self, trace: dict):
+        if self.accepts():
+            self.push(json.dumps(trace, separators=(',', ':')))
+
+
+trace_buffer = TraceBuffer(max_size=settings.TRAFFIC_CAPTURE["BUFFER_SIZE"])
+
+
+# ✅Raw ASGI middleware; requests that aren't sampled pass straight through
+class TrafficRecorder:
+    def __init__(self, app, sample_rate: float, query_allowlist: list, buffer: TraceBuffer = trace_buffer):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.query_allowlist = set(query_allowlist)
+        self.buffer = buffer
+
+    def _query(self, raw: bytes) -> str:
+        if not raw:
+            return ""
+        return urlencode([
+            (name, value) for name, value in parse_qsl(raw.decode('latin-1'), keep_blank_values=True)
+            if name in self.query_allowlist
+        ])
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        ts = time.time()
+        start = time.perf_counter()
+        recorder = StatusRecorder(send)
+        try:
+            await self.app(scope, receive, recorder)
+        finally:
+            self.buffer.record({
+                "ts": round(ts, 6),
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": self._query(scope.get("query_string", b"")),
+                "status": recorder.status,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+            })
+
+
+def write_traces(path: str, lines: list):
+    with open(path, "a") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+async def flush_traces(buffer: TraceBuffer, path: str):
+    lines = buffer.drain()
+    if lines:
+        await sync_to_async(write_traces, thread_sensitive=False)(path, lines)
+
+
+# ♻️Append buffered traces to the JSONL file every FLUSH_INTERVAL seconds
+async def run_trace_writer(buffer: TraceBuffer):
+    config = settings.TRAFFIC_CAPTURE
+    while True:
+        await asyncio.sleep(config["FLUSH_INTERVAL"])
+        try:
+            await flush_traces(buffer, config["PATH"])
+        except Exception:
+            logger.exception("Writing request traces failed")
+
+
+trace_writer = BackgroundTask(run_trace_writer, trace_buffer)
+start_trace_writer = trace_writer.start
+
+
+async def stop_trace_writer():
+    await trace_writer.stop()
+    await flush_traces(trace_buffer, settings.TRAFFIC_CAPTURE["PATH"])
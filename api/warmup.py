@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+
+from .background import BackgroundTask
+from .cache import aget, short_key_l1
+from .db import db_pool
+from .models import ClickRollupDaily, URLMapping
+
+logger = logging.getLogger(__name__)
+
+# Set after every warm-up; if it's gone, Redis was flushed or restarted
+SENTINEL_KEY = "warmup:sentinel"
+
+
+# ✅The keys worth having in cache: most clicked over the last `days`
+# (from the daily rollups), topped up with the most recently created links
+def hot_short_keys(limit: int, days: int) -> dict:
+    since = timezone.now().date() - timedelta(days=days)
+    hot = (
+        ClickRollupDaily.objects.filter(bucket__gte=since)
+        .values('url_mapping_id', 'url_mapping__short_url', 'url_mapping__long_url')
+        .annotate(total=Sum('clicks')).order_by('-total')[:limit]
+    )
+    keys = {row['url_mapping__short_url']: row['url_mapping__long_url'] for row in hot}
+    if len(keys) < limit:
+        recent = URLMapping.objects.order_by('-id').values_list('short_url', 'long_url')[:limit]
+        for short_key, long_url in recent:
+            if len(keys) >= limit:
+                break
+            keys.setdefault(short_key, long_url)
+    return keys
+
+
+# ✅Preload the hot keys into Redis (set_many is one pipeline per chunk)
+# and into this worker's L1, calling `progress(done, total)` after each chunk
+def warm_short_keys(limit: int, days: int, chunk_size: int, progress=None) -> int:
+    keys = list(hot_short_keys(limit, days).items())
+
+    l1_room = short_key_l1.max_size
+    for start in range(0, len(keys), chunk_size):
+        chunk = keys[start:start + chunk_size]
+        cache.set_many({f"short:{short_key}": long_url for short_key, long_url in chunk})
+        for short_key, long_url in chunk[:max(0, l1_room - start)]:
+            short_key_l1.set(short_key, long_url)
+        if progress is not None:
+            progress(start + len(chunk), len(keys))
+    cache.set(SENTINEL_KEY, timezone.now().isoformat(), timeout=None)
+    return len(keys)
+
+
+def _log_progress(done: int, total: int):
+    logger.info("Cache warm-up: %s/%s short keys loaded", done, total)
+
+
+# ♻️Warm up once at startup, then again whenever the sentinel disappears
+async def run_cache_warmup():
+    config = settings.CACHE_WARMUP
+    needed = True
+    while True:
+        try:
+            if needed or await aget(SENTINEL_KEY) is None:
+                loaded = await db_pool.run(warm_short_keys, config["LIMIT"], config["DAYS"], config["CHUNK_SIZE"], _log_progress)
+                logger.info("Cache warm-up done: %s short keys", loaded)
+            needed = False
+        except Exception:
+            logger.exception("Cache warm-up failed")
+        await asyncio.sleep(config["CHECK_INTERVAL"])
+
+
+# Runs in the background: the app serves requests while the cache fills
+cache_warmup = BackgroundTask(run_cache_warmup)
+start_cache_warmup = cache_warmup.start
@@ -0,0 +1,104 @@
+"""Redirect overhead through the full app: framework stack vs. the raw ASGI fast lane.
+
+    python -m benchmarks.fast_lane --requests 20000 --concurrency 50
+
+Needs the database and Redis from settings (see README).
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "myproject.settings")
+django.setup()
+
+import httpx
+from django.conf import settings
+
+from api.models import CustomUser, URLMapping
+from myproject.asgi import get_application
+
+BENCH_KEY = "bench1"
+BENCH_URL = "https://example.com/benchmark?q=café au lait"
+
+# both apps must answer these identically
+PARITY_CHECKS = (
+    ("GET", f"/api/{BENCH_KEY}", {}),
+    ("GET", f"/api/{BENCH_KEY}?utm=1", {"referer": "https://ref.example", "user-agent": "bench"}),
+    ("GET", "/api/missing_key", {}),
+    ("GET", "/api/test", {}),
+    ("GET", "/api/links", {}),
+    ("GET", "/api/docs", {}),
+    ("GET", f"/api/{BENCH_KEY}/", {}),
+    ("GET", f"/api/{BENCH_KEY}", {"origin": "https://ui.example"}),
+    ("HEAD", f"/api/{BENCH_KEY}", {}),
+    ("POST", f"/api/{BENCH_KEY}", {}),
+)
+
+
+def build(fast_lane: bool):
+    settings.REDIRECT_FAST_LANE = {**settings.REDIRECT_FAST_LANE, "ENABLED": fast_lane}
+    return get_application()
+
+
+def seed():
+    user, _ = CustomUser.objects.get_or_create(username="bench", defaults={"email": "bench@example.com"})
+    URLMapping.objects.update_or_create(short_url=BENCH_KEY, defaults={"long_url": BENCH_URL, "created_by": user})
+
+
+def client(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+
+async def check_parity(full_app, fast_app):
+    async with client(full_app) as full, client(fast_app) as fast:
+        for method, url, headers in PARITY_CHECKS:
+            expected = await full.request(method, url, headers=headers)
+            actual = await fast.request(method, url, headers=headers)
+            same = (
+                expected.status_code == actual.status_code
+                and expected.headers.get("location") == actual.headers.get("location")
+                and expected.content == actual.content
+            )
+            assert same, (method, url, expected.status_code, actual.status_code, expected.headers, actual.headers)
+
+
+async def drive(app, total: int, concurrency: int) -> float:
+    async with client(app) as bench:
+        await bench.get(f"/api/{BENCH_KEY}")
+        remaining = total
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                response = await bench.get(f"/api/{BENCH_KEY}")
+                assert response.status_code == 307, response.status_code
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - start
+
+
+async def main(total: int, concurrency: int):
+    full_app, fast_app = build(fast_lane=False), build(fast_lane=True)
+    await check_parity(full_app, fast_app)
+    print(f"responses identical for {len(PARITY_CHECKS)} request shapes")
+
+    timings = {}
+    for name, app in (("framework stack", full_app), ("fast lane", fast_app)):
+        elapsed = await drive(app, total, concurrency)
+        timings[name] = elapsed / total * 1e6
+        print(f"{name:<20} {total / elapsed:10.1f} req/s {timings[name]:8.1f} us/req")
+    print(f"{'saved':<20} {'':>16} {timings['framework stack'] - timings['fast lane']:8.1f} us/req")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    seed()
+    asyncio.run(main(args.requests, args.concurrency))
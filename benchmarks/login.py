@@ -0,0 +1,107 @@
+"""Redirect latency while logins run: bcrypt inline on the event loop vs. the hash pool.
+
+    python -m benchmarks.login --duration 5 --login-concurrency 8
+
+Needs the database and Redis from settings (see README).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "myproject.settings")
+django.setup()
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from fastapi import Depends
+
+from api.auth import get_password_hash, verify_password
+from api.auth_endpoints import auth_app, get_user
+from api.endpoints import app as api_app
+from api.models import CustomUser, URLMapping
+
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench-password"
+BENCH_KEY = "bench1"
+REDIRECT_INTERVAL = 0.005
+
+# ⏪The pre-pool login, with bcrypt on the event loop, kept here as the baseline
+legacy_auth_app = FastAPI()
+
+
+@legacy_auth_app.post("/token")
+async def legacy_login(form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await get_user(form_data.username)
+    if not user or not verify_password(form_data.password, user.password):
+        raise HTTPException(status_code=401)
+    return {"ok": True}
+
+
+def seed():
+    user, _ = CustomUser.objects.update_or_create(
+        username=BENCH_USER,
+        defaults={"email": "bench@example.com", "password": get_password_hash(BENCH_PASSWORD)},
+    )
+    URLMapping.objects.get_or_create(
+        short_url=BENCH_KEY, defaults={"long_url": "https://example.com/benchmark", "created_by": user}
+    )
+
+
+def percentile(samples: list, pct: float) -> float:
+    return statistics.quantiles(samples, n=100)[int(pct) - 1] if len(samples) > 1 else samples[0]
+
+
+async def measure(login_app, login_concurrency: int, duration: float) -> list:
+    api = httpx.AsyncClient(transport=httpx.ASGITransport(app=api_app), base_url="http://bench")
+    auth = httpx.AsyncClient(transport=httpx.ASGITransport(app=login_app), base_url="http://bench")
+    async with api, auth:
+        await api.get(f"/{BENCH_KEY}")
+        deadline = time.monotonic() + duration
+
+        async def login_worker():
+            while time.monotonic() < deadline:
+                response = await auth.post("/token", data={"username": BENCH_USER, "password": BENCH_PASSWORD})
+                assert response.status_code == 200, response.status_code
+
+        login_tasks = [asyncio.create_task(login_worker()) for _ in range(login_concurrency)]
+        # Redirects go out on a fixed schedule and latency counts from the scheduled
+        # time, so time spent stuck behind a blocked event loop is not hidden.
+        latencies = []
+        next_at = time.perf_counter()
+        while time.monotonic() < deadline:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await api.get(f"/{BENCH_KEY}")
+            latencies.append((time.perf_counter() - next_at) * 1000)
+            next_at += REDIRECT_INTERVAL
+        await asyncio.gather(*login_tasks)
+        return latencies
+
+
+async def main(args):
+    scenarios = (
+        ("no logins", auth_app, 0),
+        ("bcrypt inline", legacy_auth_app, args.login_concurrency),
+        ("bcrypt pool", auth_app, args.login_concurrency),
+    )
+    print(f"{'redirect latency (ms)':<22} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for name, login_app, login_concurrency in scenarios:
+        samples = await measure(login_app, login_concurrency, args.duration)
+        print(
+            f"{name:<22} {percentile(samples, 50):8.2f} {percentile(samples, 95):8.2f} "
+            f"{percentile(samples, 99):8.2f} {max(samples):8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per scenario")
+    parser.add_argument("--login-concurrency", type=int, default=8)
+    seed()
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""Redirect throughput: the old threadpool handler vs. the async hot path.
+
+    python -m benchmarks.redirect --requests 5000 --concurrency 50
+
+Needs the database and Redis from settings (see README).
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "myproject.settings")
+django.setup()
+
+import httpx
+from django.core.cache import cache
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import RedirectResponse
+
+from api.endpoints import app as async_app
+from api.models import CustomUser, URLMapping
+
+BENCH_KEY = "bench1"
+BENCH_URL = "https://example.com/benchmark"
+
+# ⏪The pre-async handler, kept here as the baseline
+legacy_app = FastAPI()
+
+
+@legacy_app.get("/{short_key}")
+def legacy_redirect_url(short_key: str):
+    cache_key = f"short:{short_key}"
+    cached_long_url = cache.get(cache_key)
+    if cached_long_url:
+        return RedirectResponse(url=cached_long_url)
+
+    mapping = URLMapping.objects.filter(short_url=short_key).first()
+    if mapping:
+        long_url = mapping.long_url
+        cache.set(cache_key, long_url)
+        return RedirectResponse(url=long_url)
+    else:
+        raise HTTPException(status_code=404, detail="URL not found")
+
+
+def seed():
+    user, _ = CustomUser.objects.get_or_create(username="bench", defaults={"email": "bench@example.com"})
+    URLMapping.objects.get_or_create(short_url=BENCH_KEY, defaults={"long_url": BENCH_URL, "created_by": user})
+
+
+async def drive(app, total: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # warm the cache so both runs measure the hit path
+        await client.get(f"/{BENCH_KEY}")
+        remaining = total
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                response = await client.get(f"/{BENCH_KEY}")
+                assert response.status_code == 307, response.status_code
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+
+async def main(total: int, concurrency: int):
+    for name, app in (("sync (threadpool)", legacy_app), ("async", async_app)):
+        rps = await drive(app, total, concurrency)
+        print(f"{name:<20} {rps:10.1f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    seed()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,103 @@
+"""Replay a recorded trace (see TRAFFIC_CAPTURE in settings) against a running instance.
+
+    python -m benchmarks.replay traffic.jsonl --base-url http://127.0.0.1:8000
+    python -m benchmarks.replay traffic.jsonl --speed 4          # 4x the recorded rate
+    python -m benchmarks.replay traffic.jsonl --speed 0          # as fast as possible
+
+Requests go out open-loop at their recorded offsets divided by --speed, so a slow
+server shows up as latency (counted from the scheduled time) instead of a lower rate.
+Only methods without a body (GET, HEAD by default) are replayed; traces hold no bodies.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import Counter
+
+import httpx
+
+
+def load_trace(path: str, methods: set) -> list:
+    with open(path) as f:
+        traces = [json.loads(line) for line in f if line.strip()]
+    traces = [trace for trace in traces if trace["method"] in methods]
+    traces.sort(key=lambda trace: trace["ts"])
+    return traces
+
+
+def percentile(samples: list, pct: int) -> float:
+    return statistics.quantiles(samples, n=100)[pct - 1] if len(samples) > 1 else samples[0]
+
+
+async def replay(traces: list, base_url: str, speed: float, max_in_flight: int, timeout: float) -> dict:
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    slots = asyncio.Semaphore(max_in_flight)
+    latencies = []
+    statuses = Counter()
+    mismatches = 0
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        async def send(trace: dict, scheduled: float):
+            nonlocal mismatches
+            url = trace["path"] + (f"?{trace['query']}" if trace.get("query") else "")
+            try:
+                async with slots:
+                    response = await client.request(trace["method"], url)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = "error"
+            latencies.append((time.perf_counter() - scheduled) * 1000)
+            statuses[status] += 1
+            mismatches += status != trace["status"]
+
+        first_ts = traces[0]["ts"]
+        start = time.perf_counter()
+        tasks = []
+        for trace in traces:
+            scheduled = start + ((trace["ts"] - first_ts) / speed if speed else 0)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(trace, scheduled)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    recorded_span = traces[-1]["ts"] - first_ts
+    return {
+        "requests": len(traces),
+        "elapsed": elapsed,
+        "recorded_span": recorded_span,
+        "rps": len(traces) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "statuses": dict(statuses),
+        "status_mismatches": mismatches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("trace", help="JSONL trace written by the TrafficRecorder middleware")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = recorded rate, 2 = twice as fast, 0 = no pauses")
+    parser.add_argument("--methods", default="GET,HEAD")
+    parser.add_argument("--max-in-flight", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    args = parser.parse_args()
+
+    traces = load_trace(args.trace, {method.strip().upper() for method in args.methods.split(",")})
+    if not traces:
+        parser.exit(1, "No requests to replay\n")
+    result = asyncio.run(replay(traces, args.base_url, args.speed, args.max_in_flight, args.timeout))
+
+    print(f"{result['requests']} requests in {result['elapsed']:.1f}s "
+          f"(recorded over {result['recorded_span']:.1f}s), {result['rps']:.1f} req/s")
+    print(f"latency from schedule (ms): p50 {result['p50']:.2f}  p95 {result['p95']:.2f}  p99 {result['p99']:.2f}")
+    print("statuses: " + ", ".join(f"{status}: {count}" for status, count in sorted(result["statuses"].items(), key=str)))
+    print(f"status differs from the recording: {result['status_mismatches']}")
+
+
+if __name__ == "__main__":
+    main()
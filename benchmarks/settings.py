@@ -0,0 +1,29 @@
+"""Settings for `python -m benchmarks.suite`: the project settings with the
+database and Redis picked by the suite (see BENCH_* below)."""
+import os
+
+from myproject.settings import *  # noqa: F401,F403
+
+# "sqlite" (a throwaway file) or "postgres" (the database from myproject.settings)
+if os.environ.get("BENCH_DATABASE", "sqlite") == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ["BENCH_SQLITE_PATH"],
+            # writes from the threadpool queue up behind SQLite's single writer
+            "OPTIONS": {"timeout": 30},
+            "CONN_MAX_AGE": DB_POOL["CONN_MAX_AGE"],  # noqa: F405
+            "CONN_HEALTH_CHECKS": DB_POOL["HEALTH_CHECKS"],  # noqa: F405
+        }
+    }
+
+# set by the suite to the in-process Redis stand-in, unless it runs against a real Redis
+if os.environ.get("BENCH_REDIS_URL"):
+    CACHES["default"]["LOCATION"] = os.environ["BENCH_REDIS_URL"]  # noqa: F405
+
+# Timer-driven jobs would land in random scenarios' query counts; the click flusher
+# stays on, since writing clicks is part of what a redirect costs.
+CACHE_WARMUP = {**CACHE_WARMUP, "ENABLED": False}  # noqa: F405
+CLICK_ROLLUPS = {**CLICK_ROLLUPS, "IN_PROCESS": False}  # noqa: F405
+# every encode in the suite sets a title, this only guards against stray network calls
+TITLE_ENRICHMENT = {**TITLE_ENRICHMENT, "ENABLED": False}  # noqa: F405
@@ -0,0 +1,352 @@
+"""Benchmark suite: the full ASGI app from myproject/asgi.py under load.
+
+    python -m benchmarks.suite                               # SQLite + in-process Redis
+    python -m benchmarks.suite --database postgres --redis local
+    python -m benchmarks.suite --scenarios redirect,links --concurrency 50
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --check benchmarks/baseline.json   # CI: exit 1 on regression
+    python -m benchmarks.suite --check benchmarks/baseline.json --check-timings   # same machine only
+
+The in-process Redis stand-in needs fakeredis (pip install fakeredis).
+Scenarios: redirect, encode, batch, links, links_stream, login.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+SCENARIOS = ("redirect", "encode", "batch", "links", "links_stream", "login")
+
+BENCH_USER = "bench"
+BENCH_LINKS_USER = "bench-links"
+BENCH_PASSWORD = "bench-password"
+REDIRECT_KEYS = 100
+
+
+# 1️⃣Local stand-ins, set up before Django reads its settings
+def start_fake_redis() -> tuple:
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        sys.exit("--redis fake needs fakeredis: pip install fakeredis (or use --redis local)")
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"redis://127.0.0.1:{port}/1"
+
+
+def setup_django(args, workdir: str):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "benchmarks.settings"
+    os.environ["BENCH_DATABASE"] = args.database
+    os.environ["BENCH_SQLITE_PATH"] = os.path.join(workdir, "bench.sqlite3")
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command("migrate", verbosity=0)
+
+
+# 2️⃣Query counting: every connection, on every thread, counts its statements
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self):
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+
+        def on_connect(sender, connection, **kwargs):
+            connection.execute_wrappers.append(self)
+
+        connection_created.connect(on_connect, weak=False)
+        for connection in connections.all():
+            if connection.connection is not None:
+                connection.execute_wrappers.append(self)
+
+
+# 3️⃣Data: a user for the write scenarios, one with a large account, keys to redirect to
+def seed(links_account_size: int):
+    from api.auth import get_password_hash
+    from api.models import CustomUser, URLMapping, UserURLMapping, long_url_digest
+
+    user, _ = CustomUser.objects.update_or_create(
+        username=BENCH_USER,
+        defaults={"email": "bench@example.com", "password": get_password_hash(BENCH_PASSWORD)},
+    )
+    links_user, _ = CustomUser.objects.update_or_create(
+        username=BENCH_LINKS_USER,
+        defaults={"email": "bench-links@example.com", "password": get_password_hash(BENCH_PASSWORD)},
+    )
+
+    def mappings(prefix, count, owner):
+        urls = [f"https://bench.example/{prefix}/{i}" for i in range(count)]
+        URLMapping.objects.bulk_create(
+            [URLMapping(long_url=url, long_url_digest=long_url_digest(url), short_url=f"{prefix}{i}", created_by=owner)
+             for i, url in enumerate(urls)],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        return URLMapping.objects.filter(short_url__startswith=prefix).values_list('id', flat=True)
+
+    mappings("r", REDIRECT_KEYS, user)
+    UserURLMapping.objects.bulk_create(
+        [UserURLMapping(user=links_user, url_mapping_id=mapping_id, title=f"Link {mapping_id}")
+         for mapping_id in mappings("l", links_account_size, links_user)],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+# 4️⃣Scenarios: each returns an async function that makes request number `i`
+# and returns True if the response was the expected one
+async def bearer(client, username: str) -> dict:
+    response = await client.post("/auth/token", data={"username": username, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def make_scenario(name: str, client, args):
+    run = uuid.uuid4().hex[:8]
+
+    if name == "redirect":
+        async def request(i):
+            response = await client.get(f"/api/r{i % REDIRECT_KEYS}")
+            return response.status_code == 307
+        return request
+
+    if name == "encode":
+        headers = await bearer(client, BENCH_USER)
+
+        async def request(i):
+            response = await client.post(
+                "/api/encode", headers=headers,
+                json={"url": f"https://bench.example/{run}/encode/{i}", "title": "bench"},
+            )
+            return response.status_code == 200
+        return request
+
+    if name == "batch":
+        headers = await bearer(client, BENCH_USER)
+
+        async def request(i):
+            items = [{"url": f"https://bench.example/{run}/batch/{i}/{j}", "title": "bench"}
+                     for j in range(args.batch_size)]
+            response = await client.post("/api/encode/batch", headers=headers, json={"items": items})
+            return response.status_code == 200
+        return request
+
+    if name == "links":
+        headers = await bearer(client, BENCH_LINKS_USER)
+        cursors = {}
+
+        # each worker pages through the account, starting over at the end
+        async def request(i):
+            task = asyncio.current_task()
+            params = {"limit": args.page_size}
+            if cursors.get(task):
+                params["cursor"] = cursors[task]
+            response = await client.get("/api/links", headers=headers, params=params)
+            cursors[task] = response.json()["next_cursor"] if response.status_code == 200 else None
+            return response.status_code == 200
+        return request
+
+    if name == "links_stream":
+        headers = await bearer(client, BENCH_LINKS_USER)
+
+        async def request(i):
+            response = await client.get("/api/links", headers=headers)
+            return response.status_code == 200 and len(response.json()) >= args.links_account_size
+        return request
+
+    if name == "login":
+        async def request(i):
+            response = await client.post("/auth/token", data={"username": BENCH_USER, "password": BENCH_PASSWORD})
+            return response.status_code == 200
+        return request
+
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+def percentile(samples: list, pct: int) -> float:
+    return statistics.quantiles(samples, n=100)[pct - 1] if len(samples) > 1 else samples[0]
+
+
+# 5️⃣Closed-loop driver: `concurrency` workers, each sending its next request as soon as the last one returns
+async def drive(request, total: int, concurrency: int, counter: QueryCounter) -> dict:
+    latencies = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < total:
+            i = next_index
+            next_index += 1
+            start = time.perf_counter()
+            ok = await request(i)
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += not ok
+
+    queries = counter.count
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": total,
+        "errors": errors,
+        "rps": total / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "queries_per_request": (counter.count - queries) / total,
+    }
+
+
+async def run_suite(args, counter: QueryCounter) -> dict:
+    import httpx
+    from myproject.asgi import app
+
+    requests = {name: args.requests for name in SCENARIOS}
+    requests["batch"] = max(1, args.requests // args.batch_size)
+    requests["links_stream"] = max(1, args.requests // 100)
+    requests["login"] = args.login_requests
+
+    # app exceptions come back as 500s and count as errors, as they would from a server
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    # mounted apps only see lifespan events through the outer app, so start its background tasks by hand
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            results = {}
+            for name in args.scenarios:
+                request = await make_scenario(name, client, args)
+                # one untimed round to warm caches and connections (for redirects, every key)
+                warmup = REDIRECT_KEYS if name == "redirect" else args.concurrency
+                for i in range(min(warmup, requests[name])):
+                    await request(i)
+                results[name] = await drive(request, requests[name], args.concurrency, counter)
+                print_result(name, results[name])
+            return results
+    finally:
+        await app.router.shutdown()
+
+
+def print_result(name: str, result: dict):
+    print(
+        f"{name:<14} {result['requests']:>8} {result['errors']:>7} {result['rps']:>10.1f} "
+        f"{result['p50']:>8.2f} {result['p95']:>8.2f} {result['p99']:>8.2f} {result['queries_per_request']:>10.2f}"
+    )
+
+
+# 6️⃣CI mode: compare with a stored baseline. Failed requests and queries per
+# request hold on any machine; req/s and p95 only mean something against a
+# baseline recorded on the same one, so they are checked only with `timings`.
+def regressions(results: dict, baseline: dict, tolerance: float, latency_slack: float, query_tolerance: float,
+                timings: bool = False) -> list:
+    failures = []
+    for name, result in results.items():
+        if result["errors"]:
+            failures.append(f"{name}: {result['errors']} failed requests")
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["queries_per_request"] > base["queries_per_request"] + query_tolerance:
+            failures.append(
+                f"{name}: {result['queries_per_request']:.2f} queries/request, "
+                f"baseline {base['queries_per_request']:.2f}"
+            )
+        if not timings:
+            continue
+        if result["rps"] < base["rps"] * (1 - tolerance):
+            failures.append(f"{name}: {result['rps']:.1f} req/s, baseline {base['rps']:.1f}")
+        if result["p95"] > base["p95"] * (1 + tolerance) + latency_slack:
+            failures.append(f"{name}: p95 {result['p95']:.2f} ms, baseline {base['p95']:.2f}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", choices=("sqlite", "postgres"), default="sqlite",
+                        help="a throwaway SQLite file, or the PostgreSQL database from settings")
+    parser.add_argument("--redis", choices=("fake", "local"), default="fake",
+                        help="in-process stand-in (fakeredis), or the Redis from settings")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000, help="per scenario; batch and links_stream send fewer")
+    parser.add_argument("--login-requests", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=100, help="URLs per /encode/batch request")
+    parser.add_argument("--page-size", type=int, default=100, help="links per /links page")
+    parser.add_argument("--links-account-size", type=int, default=5000)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--save-baseline", help="write the results as the new baseline")
+    parser.add_argument("--check", metavar="BASELINE", help="exit 1 if results regress past this baseline")
+    parser.add_argument("--check-timings", action="store_true",
+                        help="with --check, also compare req/s and p95; only for a baseline saved on this machine")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="with --check-timings, allowed relative drop in req/s or rise in p95 (default 0.25)")
+    parser.add_argument("--latency-slack", type=float, default=2.0,
+                        help="allowed rise in p95 on top of --tolerance, in ms, for sub-millisecond paths (default 2)")
+    parser.add_argument("--query-tolerance", type=float, default=0.1,
+                        help="allowed rise in queries per request (default 0.1)")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    server = None
+    if args.redis == "fake":
+        server, os.environ["BENCH_REDIS_URL"] = start_fake_redis()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        setup_django(args, workdir)
+        counter = QueryCounter()
+        counter.install()
+        seed(args.links_account_size)
+
+        # asgi.py serves ./staticfiles, which only exists after collectstatic
+        cwd = os.getcwd()
+        if not os.path.isdir("staticfiles"):
+            os.makedirs(os.path.join(workdir, "staticfiles"))
+            os.chdir(workdir)
+        print(f"{args.database} + {'in-process' if server else 'local'} Redis, concurrency {args.concurrency}")
+        print(f"{'scenario':<14} {'requests':>8} {'errors':>7} {'req/s':>10} "
+              f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries/req':>10}")
+        try:
+            results = asyncio.run(run_suite(args, counter))
+        finally:
+            os.chdir(cwd)
+            if server is not None:
+                server.shutdown()
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+                f.write("\n")
+
+    if args.check:
+        with open(args.check) as f:
+            failures = regressions(results, json.load(f), args.tolerance, args.latency_slack, args.query_tolerance,
+                                   timings=args.check_timings)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 import os
+from functools import partial
+
 import django
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 from fastapi import FastAPI
 from fastapi.middleware.wsgi import WSGIMiddleware
@@ -9,8 +12,20 @@ from fastapi.staticfiles import StaticFiles
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "myproject.settings")
 django.setup()
 
-from api.endpoints import app as fastapi_app
+from api.endpoints import app as fastapi_app, redirect_url, shortener
 from api.auth_endpoints import auth_app
+from api.bloom import start_short_key_bloom
+from api.clicks import start_click_flusher, stop_click_flusher
+from api.db import start_shared_connection_reaper
+from api.enrichment import start_title_enrichment
+from api.fast_lane import RedirectFastLane
+from api.metrics import MetricsMiddleware, install_query_timer
+from api.metrics_endpoint import metrics_endpoint
+from api.profiling import ProfilingMiddleware
+from api.rollups import start_click_aggregator
+from api.traffic import TrafficRecorder, start_trace_writer, stop_trace_writer
+from api.warmup import start_cache_warmup
+from api.keygen import KeyPoolAllocator, start_key_pool_refill
 
 django_asgi_app = get_asgi_application()
 
@@ -25,11 +40,56 @@ def get_application() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # ✅Redirects skip CORS, routing and the mounted app; added right after CORS,
+    # so the tracing, profiling and metrics middlewares still see them
+    if settings.REDIRECT_FAST_LANE["ENABLED"]:
+        app.add_middleware(RedirectFastLane, prefix="/api", inner_app=fastapi_app, endpoint=redirect_url)
+
+    if settings.TRAFFIC_CAPTURE["ENABLED"]:
+        app.add_middleware(
+            TrafficRecorder,
+            sample_rate=settings.TRAFFIC_CAPTURE["SAMPLE_RATE"],
+            query_allowlist=settings.TRAFFIC_CAPTURE["QUERY_ALLOWLIST"],
+        )
+        app.add_event_handler("startup", start_trace_writer)
+        app.add_event_handler("shutdown", stop_trace_writer)
+
+    if settings.PROFILING["ENABLED"]:
+        app.add_middleware(
+            ProfilingMiddleware,
+            header=settings.PROFILING["HEADER"],
+            sample_every=settings.PROFILING["SAMPLE_EVERY"],
+            token_max_age=settings.PROFILING["TOKEN_MAX_AGE"],
+            interval=settings.PROFILING["INTERVAL"],
+            directory=settings.PROFILING["DIRECTORY"],
+            max_bytes=settings.PROFILING["MAX_DIRECTORY_BYTES"],
+        )
+
+    if settings.METRICS["ENABLED"]:
+        install_query_timer()
+        app.add_middleware(MetricsMiddleware, root_app=app)
+        app.add_route(settings.METRICS["PATH"], metrics_endpoint, include_in_schema=False)
+
     app.mount("/django", WSGIMiddleware(django_asgi_app))
     app.mount("/api", fastapi_app)
     app.mount("/static", StaticFiles(directory="staticfiles"), name="static")
     app.mount("/auth", auth_app)
 
+    app.add_event_handler("startup", start_shared_connection_reaper)
+    if settings.CACHE_WARMUP["ENABLED"]:
+        app.add_event_handler("startup", start_cache_warmup)
+    if settings.SHORT_KEY_BLOOM_FILTER["ENABLED"]:
+        app.add_event_handler("startup", start_short_key_bloom)
+    if settings.CLICK_TRACKING["ENABLED"]:
+        app.add_event_handler("startup", start_click_flusher)
+        app.add_event_handler("shutdown", stop_click_flusher)
+    if settings.TITLE_ENRICHMENT["ENABLED"]:
+        app.add_event_handler("startup", start_title_enrichment)
+    if settings.CLICK_ROLLUPS["IN_PROCESS"]:
+        app.add_event_handler("startup", start_click_aggregator)
+    if isinstance(shortener.key_allocator, KeyPoolAllocator):
+        app.add_event_handler("startup", partial(start_key_pool_refill, shortener.key_allocator))
+
     return app
 
 app = get_application()
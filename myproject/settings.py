@@ -57,6 +57,18 @@ TEMPLATES = [
     }
 ]
 
+# database connections: persistent for CONN_MAX_AGE seconds and pinged before reuse;
+# sync ORM work from async code runs on at most MAX_CONNECTIONS pooled threads
+# (api.db), whose connections close after IDLE_TIMEOUT seconds unused; the async
+# ORM's shared connection is checked every REAP_INTERVAL seconds
+DB_POOL = {
+    "MAX_CONNECTIONS": 10,
+    "CONN_MAX_AGE": 300,
+    "HEALTH_CHECKS": True,
+    "IDLE_TIMEOUT": 60,
+    "REAP_INTERVAL": 30,
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -65,6 +77,8 @@ DATABASES = {
         'PASSWORD': 'mypassword',
         'HOST': 'localhost',
         'PORT': '5432',
+        'CONN_MAX_AGE': DB_POOL["CONN_MAX_AGE"],
+        'CONN_HEALTH_CHECKS': DB_POOL["HEALTH_CHECKS"],
     }
 }
 
@@ -101,12 +115,210 @@ STATICFILES_FINDERS = (
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Redis connection pools (sync django-redis client and the async client in api.cache):
+# at most MAX_CONNECTIONS each, callers wait up to TIMEOUT seconds for a free one;
+# connections idle for HEALTH_CHECK_INTERVAL seconds are pinged before reuse
+REDIS_POOL = {
+    "MAX_CONNECTIONS": 50,
+    "TIMEOUT": 5,
+    "HEALTH_CHECK_INTERVAL": 30,
+    "SOCKET_CONNECT_TIMEOUT": 2,
+    "SOCKET_TIMEOUT": 2,
+}
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
         "LOCATION": "redis://127.0.0.1:6379/1",
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "CONNECTION_POOL_CLASS": "redis.BlockingConnectionPool",
+            "CONNECTION_POOL_KWARGS": {
+                "max_connections": REDIS_POOL["MAX_CONNECTIONS"],
+                "timeout": REDIS_POOL["TIMEOUT"],
+                "health_check_interval": REDIS_POOL["HEALTH_CHECK_INTERVAL"],
+            },
+            "SOCKET_CONNECT_TIMEOUT": REDIS_POOL["SOCKET_CONNECT_TIMEOUT"],
+            "SOCKET_TIMEOUT": REDIS_POOL["SOCKET_TIMEOUT"],
         }
     }
 }
+
+# in-process L1 cache for short key -> long URL lookups (per worker, in front of Redis)
+SHORT_KEY_L1_CACHE = {
+    "MAX_SIZE": 10000,
+    "TTL": 60,
+}
+
+# unknown short keys: negative cache TTL (seconds) and optional Bloom filter guard
+SHORT_KEY_NEGATIVE_TTL = 30
+SHORT_KEY_BLOOM_FILTER = {
+    "ENABLED": False,
+    "CAPACITY": 1000000,
+    "ERROR_RATE": 0.01,
+    "SYNC_INTERVAL": 30,
+}
+
+# cache misses for the same short key are coalesced within a worker; with
+# CROSS_WORKER_LOCK a Redis lock (held at most LOCK_TTL seconds) lets one worker
+# query the database while the others poll Redis for up to LOCK_WAIT seconds
+SHORT_KEY_SINGLE_FLIGHT = {
+    "CROSS_WORKER_LOCK": False,
+    "LOCK_TTL": 2,
+    "LOCK_WAIT": 0.5,
+    "POLL_INTERVAL": 0.02,
+}
+
+# short key allocation: "sequence" (base62 of a per-worker reserved id block, no retries),
+# "pool" (pre-generated keys, see SHORT_KEY_POOL)
+# or "random" (the original 6-character keys, checked against the table for collisions)
+SHORT_KEY_ALLOCATOR = {
+    "STRATEGY": "sequence",
+    "LENGTH": 7,
+    "BLOCK_SIZE": 1000,
+    # scramble ids with a reversible affine map so keys are not guessable in order
+    "OBFUSCATE": True,
+    "MULTIPLIER": 2176477521739,
+    "OFFSET": 1344904618110,
+}
+
+# pre-generated key reservoir for the "pool" strategy, refilled in the background
+SHORT_KEY_POOL = {
+    "LENGTH": 6,
+    "LOW_WATER": 5000,
+    "REFILL_SIZE": 20000,
+    "CLAIM_BATCH": 100,
+    "REFILL_INTERVAL": 10,
+}
+
+# POST /api/encode/batch: max URLs per request, rows per IN-lookup / INSERT statement
+ENCODE_BATCH = {
+    "MAX_ITEMS": 10000,
+    "CHUNK_SIZE": 1000,
+}
+
+# GET /api/links: page sizes for ?limit= and rows per query when streaming the full list
+LINKS_PAGE = {
+    "DEFAULT_LIMIT": 100,
+    "MAX_LIMIT": 1000,
+    "STREAM_CHUNK_SIZE": 1000,
+}
+
+# click tracking: redirects buffer events in memory (dropped and counted once full),
+# a background task writes them to ClickEvent in batches
+CLICK_TRACKING = {
+    "ENABLED": True,
+    "BUFFER_SIZE": 100000,
+    "BATCH_SIZE": 5000,
+    "FLUSH_INTERVAL": 2,
+}
+
+# click rollups: ClickEvent is folded into hourly/daily tables every INTERVAL seconds
+# (in every worker if IN_PROCESS, otherwise run `manage.py aggregate_clicks` from cron)
+CLICK_ROLLUPS = {
+    "IN_PROCESS": True,
+    "INTERVAL": 60,
+    "BATCH_SIZE": 50000,
+}
+
+# authenticated principal (id, username, disabled) cached in Redis per token subject,
+# dropped whenever the user is saved or deleted (not on QuerySet.update(), see api/signals.py)
+AUTH_PRINCIPAL = {
+    "CACHE_TTL": 60,
+    # take uid/disabled from the signed access token and skip the lookup entirely;
+    # a user disabled mid-session then keeps access until their access token
+    # expires (ACCESS_TOKEN_EXPIRE_MINUTES); refresh tokens are never accepted
+    "TRUST_TOKEN_CLAIMS": False,
+}
+
+# password hashing: bcrypt cost and the dedicated pool that runs it off the event loop
+PASSWORD_HASHING = {
+    "BCRYPT_ROUNDS": 12,
+    "WORKERS": 4,
+    # queued + running jobs before logins get a 503
+    "MAX_PENDING": 64,
+}
+
+# Google signing keys for the OAuth callback, cached per the response's Cache-Control max-age
+GOOGLE_JWKS = {
+    "URL": "https://www.googleapis.com/oauth2/v3/certs",
+    "TIMEOUT": 5,
+    "DEFAULT_MAX_AGE": 3600,
+    # least seconds between refetches triggered by an unknown kid
+    "MIN_REFETCH_INTERVAL": 30,
+}
+
+# POST /api/fetch_title: bytes read before giving up on <title>, timeouts (seconds),
+# concurrent fetches per host, cache TTLs for titles and for failures
+TITLE_FETCHER = {
+    "MAX_BYTES": 65536,
+    "CONNECT_TIMEOUT": 3,
+    "READ_TIMEOUT": 5,
+    "TOTAL_TIMEOUT": 10,
+    "PER_HOST_CONCURRENCY": 4,
+    "CACHE_TTL": 86400,
+    "FAILURE_TTL": 300,
+}
+
+# links encoded without a title get one fetched in the background: queued jobs
+# (dropped past MAX_PENDING) are handled BATCH_SIZE at a time, with requests to
+# the same host at least HOST_INTERVAL seconds apart
+TITLE_ENRICHMENT = {
+    "ENABLED": True,
+    "MAX_PENDING": 10000,
+    "BATCH_SIZE": 100,
+    "HOST_INTERVAL": 1.0,
+    "POLL_INTERVAL": 1,
+}
+
+# cache warm-up: at startup (and whenever Redis turns out to have been flushed,
+# checked every CHECK_INTERVAL seconds) load the LIMIT most clicked links of the
+# last DAYS days, topped up with the newest links, into Redis and L1.
+# Also available as `manage.py warm_cache`.
+CACHE_WARMUP = {
+    "ENABLED": True,
+    "LIMIT": 10000,
+    "DAYS": 7,
+    "CHUNK_SIZE": 1000,
+    "CHECK_INTERVAL": 30,
+}
+
+# request traces for `python -m benchmarks.replay`: a SAMPLE_RATE share of requests is
+# appended to PATH as JSONL (method, path, allowlisted query params, status, timing)
+TRAFFIC_CAPTURE = {
+    "ENABLED": False,
+    "SAMPLE_RATE": 0.01,
+    "PATH": os.path.join(BASE_DIR, "traffic.jsonl"),
+    "QUERY_ALLOWLIST": ["limit", "hours", "days", "top"],
+    "BUFFER_SIZE": 10000,
+    "FLUSH_INTERVAL": 1,
+}
+
+# Prometheus text metrics on the outer app at PATH (per worker): request latency
+# per route, ORM queries per request, cache hit/miss per tier and key family
+METRICS = {
+    "ENABLED": True,
+    "PATH": "/metrics",
+    "LATENCY_BUCKETS": [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+    "QUERY_COUNT_BUCKETS": [0, 1, 2, 3, 5, 10, 20, 50, 100],
+}
+
+# opt-in request profiling: requests with a signed HEADER (`manage.py profile_token`)
+# or one in SAMPLE_EVERY (0 = never) get a stack-sampled profile (.folded, for
+# flamegraph.pl/speedscope) and their SQL (.sql.txt) written to DIRECTORY,
+# oldest files removed past MAX_DIRECTORY_BYTES
+PROFILING = {
+    "ENABLED": False,
+    "HEADER": "X-Profile-Token",
+    "TOKEN_MAX_AGE": 3600,
+    "SAMPLE_EVERY": 0,
+    "INTERVAL": 0.001,
+    "DIRECTORY": os.path.join(BASE_DIR, "profiles"),
+    "MAX_DIRECTORY_BYTES": 100 * 1024 * 1024,
+    "MAX_SQL_QUERIES": 1000,
+}
+
+# GET /api/{short_key} answered by a raw ASGI handler ahead of the framework stack
+REDIRECT_FAST_LANE = {
+    "ENABLED": True,
+}